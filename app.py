@@ -1,29 +1,74 @@
-from flask import Flask, render_template, jsonify, request
-from apscheduler.schedulers.background import BackgroundScheduler
+from startup import startup_timer
+from flask import Flask, Response, g, render_template, jsonify, request
 import atexit
+import hmac
 import json
 import os
-from datetime import datetime
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
 import threading
-from scraper import DeadmanScraper
 from data_processor import DataProcessor
 from database import HistoryDatabase
+from pipeline import (UpdatePipeline, load_latest_snapshot, metrics_path_for, notify_path_for, read_notification,
+                      shared_payloads_path_for)
+from response_cache import (JSON_MIMETYPE, PAGE_FIELDS, PayloadBuilder, PayloadSet, compact_dumps,
+                            compose_object, fields_key, parse_fields, patch_payload, payload_response, select_fields,
+                            serialize_payload)
+from shared_payloads import load_payload_file, write_payload_file
+from event_stream import EventBroker, stream_events
+from json_patch import make_patch
+from metrics import (DATA_AGE_SECONDS, DB_PLAYERS, DB_ROWS, DB_SNAPSHOT_RANGE, DB_SNAPSHOTS_24H, HTTP_REQUEST_SECONDS,
+                     REGISTRY, STREAM_SUBSCRIBERS, read_metrics_file)
+from profiling import SamplingProfiler, describe_profile, list_profiles
+from config import Config
+
+startup_timer.mark('imports')
 
 app = Flask(__name__)
 
-# Initialize scraper, data processor, and database
-scraper = DeadmanScraper()
+# Initialize data processor and database
 data_processor = DataProcessor()
-db = HistoryDatabase()
+db = HistoryDatabase(read_only=Config.RUN_MODE == 'web')  # The worker owns schema and writes in web mode
+startup_timer.mark('database')
+
+# The current data version: an immutable PayloadSet holding the pre-serialized API
+# responses (and the /api/data document they were built from). Each refresh builds
+# a new one and publishes it with a single reference assignment, so handlers take
+# one local reference and never lock. The builder also keeps the recent versions
+# for /api/data?since=<version>
+payload_builder = PayloadBuilder(compact_dumps, data_processor, Config.PATCH_HISTORY)
+api_payloads = payload_builder.current
+
+# Pushes a small event to /api/stream clients whenever a new data version is installed
+event_broker = EventBroker(max_subscribers=Config.STREAM_MAX_SUBSCRIBERS)
+
+# Opt-in sampling profiler for a fraction of requests and every Nth update cycle
+profiler = None
+if Config.PROFILE_ENABLED:
+    profiler = SamplingProfiler(Config.PROFILE_DIR, Config.PROFILE_INTERVAL, Config.PROFILE_KEEP)
 
-# Global variable to store latest data with thread safety
-latest_data = {}
-last_update = None
-data_lock = threading.Lock()
+def install_data(data: Dict, updated_at: datetime):
+    """Publish a new processed data version to the API"""
+    # install_data runs from one thread at a time (startup load, then the scheduler or update watcher)
+    payloads = payload_builder.build(data, updated_at)
+    if Config.FAST_START and Config.RUN_MODE != 'web':
+        # Persisted so the next start can serve this version without parsing or rebuilding it
+        write_payload_file(shared_payloads_path, payloads)
+    install_payloads(payloads)
 
-def load_initial_data():
-    """Load initial data from database if available"""
-    global latest_data, last_update
+def install_payloads(payloads: PayloadSet):
+    """Serve a new set of payloads, built here or mapped from the worker's payload file"""
+    global api_payloads
+    # A single reference assignment: requests in flight keep the version they started with
+    api_payloads = payloads
+    
+    event_broker.publish('version', payloads.event, event_id=payloads.version)
+
+def load_initial_data(parse_snapshot: bool = True):
+    """Serve the newest saved version: a published payload file mapped as it is on disk,
+    else the newest database snapshot (left to the caller when parse_snapshot is False)"""
     try:
         # Show database statistics
         db_stats = db.get_database_stats()
@@ -36,125 +81,258 @@ def load_initial_data():
         print(f"Snapshots in last 24h: {db_stats.get('snapshots_last_24h', 0)}")
         print("===========================")
         
-        # Try to load the most recent snapshot from database
-        snapshot_data = db.get_latest_snapshot()
-        if snapshot_data:
-            with data_lock:
-                latest_data = snapshot_data
-                last_update = datetime.now()  # We don't store exact timestamp in snapshot
+        # Try to load the most recent version: the worker's payload file (or in fast start,
+        # the one this process persisted last run), else the database
+        shared = load_payload_file(shared_payloads_path) if Config.RUN_MODE == 'web' or Config.FAST_START else None
+        if shared:
+            install_payloads(shared)
+            print("Loaded initial data from the shared payload file")
+            return
+        if not parse_snapshot:
+            print("No payload file yet, data will load from the database in the background")
+            return
+        entry = pipeline.load_latest() if pipeline else load_latest_snapshot(db)
+        if entry:
+            install_data(*entry)
             print("Loaded initial data from database")
         else:
             print("No existing data in database, will wait for first scrape")
     except Exception as e:
         print(f"Error loading initial data: {e}")
 
-def update_data():
-    """Background task to update hiscores data"""
-    global latest_data, last_update
-    try:
-        print(f"Starting data update at {datetime.now()}")
-        raw_data = scraper.scrape_all_data()
-        
-        # Process the data
-        processed_data = data_processor.process_data(raw_data)
-        
-        # Only update global data if processing was successful and we have valid data
-        if processed_data and processed_data.get('teams'):
-            with data_lock:
-                latest_data = processed_data
-                last_update = datetime.now()
-            
-            # Save to database for historical tracking
-            try:
-                db.save_snapshot(processed_data)
-                db.save_player_data(raw_data)
-                db.save_team_data(processed_data.get('teams', {}))
-            except Exception as db_error:
-                print(f"Error saving to database: {db_error}")
-            
-            print(f"Data updated successfully. Teams: {len(processed_data.get('teams', {}))}")
-        else:
-            print("Processed data was empty or invalid, keeping existing data")
-            
-    except Exception as e:
-        print(f"Error updating data: {e}")
-        print("Keeping existing data until next update cycle")
+def watch_for_updates(notify_path: str, seen: str):
+    """Web mode: pick up each new version the worker announces"""
+    while True:
+        time.sleep(Config.WEB_POLL_INTERVAL)
+        token = read_notification(notify_path)
+        if token == seen:
+            continue
+        try:
+            # Serve the worker's pre-serialized payloads from the shared mapping when
+            # it publishes them, otherwise rebuild them from the database snapshot
+            shared = load_payload_file(shared_payloads_path)
+            if shared:
+                install_payloads(shared)
+                print(f"Mapped new data version {shared.version}")
+            else:
+                entry = load_latest_snapshot(db)
+                if entry:
+                    install_data(*entry)
+                    print(f"Loaded new data version {token} from database")
+            seen = token
+        except Exception as e:
+            print(f"Error loading new data: {e}")
 
-# Load initial data from database
-load_initial_data()
+def start_updates():
+    """Combined mode: set up the update pipeline, load the newest data and schedule update cycles"""
+    global pipeline, scheduler
+    # Only a scraping process needs these, so they stay off the web startup path
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from scraper import DeadmanScraper
+    
+    pipeline = UpdatePipeline(DeadmanScraper(), data_processor, db, on_update=install_data,
+                              profiler=profiler, profile_every=Config.PROFILE_CYCLE_EVERY)
+    if Config.FAST_START:
+        # The persisted payloads (if any) are already being served; the snapshot still
+        # seeds incremental processing, and is served when there was no payload file
+        entry = pipeline.load_latest()
+        if entry and api_payloads.last_modified is None:
+            install_data(*entry)
+            print("Loaded initial data from database")
+    else:
+        load_initial_data()
+    
+    # Initialize scheduler
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(func=pipeline.run_once, trigger="interval", seconds=Config.SCRAPE_INTERVAL)
+    scheduler.start()
+    
+    # Run initial update in a separate thread (don't block startup)
+    initial_thread = threading.Thread(target=pipeline.run_once)
+    initial_thread.daemon = True
+    initial_thread.start()
+    
+    # Shut down the scheduler when exiting the app
+    atexit.register(lambda: scheduler.shutdown())
 
-# Initialize scheduler
-scheduler = BackgroundScheduler()
-scheduler.add_job(func=update_data, trigger="interval", minutes=15)
-scheduler.start()
+def start_updates_in_background():
+    start_updates()
+    print(f"⏱️  Update pipeline ready {startup_timer.elapsed() * 1000:.0f} ms after import")
 
-# Start initial data update in background (don't block startup)
-def initial_update():
-    """Run initial update without blocking startup"""
-    try:
-        update_data()
-    except Exception as e:
-        print(f"Initial update failed: {e}")
+shared_payloads_path = shared_payloads_path_for(db)
+pipeline = None
 
-# Run initial update in a separate thread
-import threading
-initial_thread = threading.Thread(target=initial_update)
-initial_thread.daemon = True
-initial_thread.start()
+if Config.RUN_MODE == 'web':
+    # Scraping runs in worker.py; this process only serves what it publishes
+    notify_path = notify_path_for(db)
+    seen_token = read_notification(notify_path)
+    load_initial_data()
+    
+    watcher_thread = threading.Thread(target=watch_for_updates, args=(notify_path, seen_token))
+    watcher_thread.daemon = True
+    watcher_thread.start()
+elif Config.FAST_START:
+    # Combined mode, fast start: serve the persisted payloads now and import, seed and
+    # schedule the update pipeline once the server is taking requests
+    load_initial_data(parse_snapshot=False)
+    startup_thread = threading.Thread(target=start_updates_in_background, name='startup')
+    startup_thread.daemon = True
+else:
+    # Combined mode: scrape, process and save in this process
+    start_updates()
+startup_timer.mark('data')
 
-# Shut down the scheduler when exiting the app
-atexit.register(lambda: scheduler.shutdown())
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    # Label by route pattern, not path, so per-player URLs share one series
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_start,
+                                 method=request.method, route=route, status=response.status_code)
+    return response
+
+# Profiling hooks are only installed when enabled, so requests pay nothing otherwise
+if profiler and Config.PROFILE_REQUEST_RATE > 0:
+    @app.before_request
+    def start_request_profile():
+        # Streams mostly wait on their queue; a profile of one would show nothing
+        if request.endpoint != 'api_stream' and random.random() < Config.PROFILE_REQUEST_RATE:
+            g.profile = profiler.start('request', request.endpoint or 'unmatched')
+    
+    @app.teardown_request
+    def stop_request_profile(exc):
+        profile = g.pop('profile', None)
+        if profile:
+            profiler.stop(profile)
+
+def collect_gauges():
+    """Refresh the gauges read from the database and the served data on each /metrics scrape"""
+    stats = db.get_database_stats()
+    DB_ROWS.set(stats['total_snapshots'], table='snapshots')
+    DB_ROWS.set(stats['total_player_records'], table='player_points')
+    DB_ROWS.set(stats['total_team_records'], table='team_history')
+    DB_PLAYERS.set(stats['unique_players'])
+    DB_SNAPSHOTS_24H.set(stats['snapshots_last_24h'])
+    for bound, timestamp in stats['snapshot_date_range'].items():
+        if timestamp:
+            moment = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            DB_SNAPSHOT_RANGE.set(moment.timestamp(), bound=bound)
+    
+    STREAM_SUBSCRIBERS.set(event_broker.subscriber_count())
+    last_modified = api_payloads.last_modified
+    if last_modified:
+        DATA_AGE_SECONDS.set(round((datetime.now() - last_modified).total_seconds(), 3))
+
+REGISTRY.on_collect(collect_gauges)
+
+@app.context_processor
+def stream_settings():
+    """Tell pages whether this server can hold /api/stream open or they should poll"""
+    return {'stream_enabled': Config.STREAM_ENABLED}
 
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
-    return render_template('dashboard.html')
+    return render_template('dashboard.html', data_fields=PAGE_FIELDS['dashboard'])
 
 @app.route('/teams')
 def teams():
     """Teams overview page"""
-    return render_template('teams.html')
+    return render_template('teams.html', data_fields=PAGE_FIELDS['teams'])
 
 @app.route('/compare')
 def compare():
     """Team comparison page"""
-    return render_template('compare.html')
+    return render_template('compare.html', data_fields=PAGE_FIELDS['compare'])
 
 @app.route('/players')
 def players():
     """Player comparison page"""
-    return render_template('players.html')
+    return render_template('players.html', data_fields=PAGE_FIELDS['players'])
+
+def projected_payload(payloads, fields, since):
+    """Payload for a field selection, as a patch when possible.
+    
+    The pages' own selections are pre-serialized with each version; any other
+    selection is built on first use and memoized for the version.
+    """
+    key = f'fields:{fields_key(fields)}'
+    payload = (payloads.get(f'{key}:since:{since}') if since else None) or payloads.get(key)
+    if payload is not None:
+        return payload
+    
+    if since == payloads.version:
+        base = payloads.document
+    else:
+        base = payload_builder.patch_log.document(since) if since else None
+    
+    def build():
+        current = select_fields(payloads.document, fields)
+        full = serialize_payload(current, compact_dumps)
+        if base is None:
+            return full
+        return patch_payload(make_patch(select_fields(base, fields), current), full, compact_dumps) or full
+    
+    return payloads.projection((fields, since if base is not None else None), build)
 
 @app.route('/api/data')
 def api_data():
-    """API endpoint to get all processed data"""
-    with data_lock:
-        return jsonify({
-            'data': latest_data,
-            'last_update': last_update.isoformat() if last_update else None
-        })
+    """API endpoint to get all processed data.
+    
+    With ?fields=overall_stats,teams.averages, returns only those parts of the
+    data. With ?since=<version>, returns a JSON patch from that version when it
+    is recent enough, otherwise the full document.
+    """
+    payloads = api_payloads
+    since = request.args.get('since')
+    fields = parse_fields(request.args.get('fields', ''))
+    if fields:
+        payload = projected_payload(payloads, fields, since)
+    else:
+        payload = (payloads.get(f'since:{since}') if since else None) or payloads.get('data')
+    return payload_response(payload, payloads.last_modified, payloads.version)
 
 @app.route('/api/teams')
 def api_teams():
     """API endpoint to get team data"""
-    with data_lock:
-        teams = latest_data.get('teams', {})
-    return jsonify(teams)
+    payloads = api_payloads
+    return payload_response(payloads.get('teams'), payloads.last_modified, payloads.version)
 
 @app.route('/api/team/<team_name>')
 def api_team(team_name):
     """API endpoint to get specific team data"""
-    with data_lock:
-        teams = latest_data.get('teams', {})
-        team_data = teams.get(team_name.upper(), {})
-    return jsonify(team_data)
+    payloads = api_payloads
+    return payload_response(
+        payloads.get(f'team:{team_name.upper()}') or payloads.get('team:'),
+        payloads.last_modified,
+        payloads.version
+    )
 
 @app.route('/api/leaderboards')
 def api_leaderboards():
     """API endpoint to get skill leaderboards"""
-    with data_lock:
-        leaderboards = latest_data.get('leaderboards', {})
-    return jsonify(leaderboards)
+    payloads = api_payloads
+    return payload_response(payloads.get('leaderboards'), payloads.last_modified, payloads.version)
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events stream announcing each new data version"""
+    if not Config.STREAM_ENABLED:
+        return jsonify({'error': 'Live updates are disabled on this server, poll /api/data'}), 404
+    subscriber = event_broker.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many live update subscribers, fall back to polling'}), 503
+    
+    response = Response(
+        stream_events(event_broker, subscriber, Config.STREAM_HEARTBEAT),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering
+    return response
 
 @app.route('/api/comparison')
 def api_comparison():
@@ -166,31 +344,74 @@ def api_comparison():
         if not team1 or not team2:
             return jsonify({'error': 'Both team1 and team2 parameters are required'}), 400
         
-        with data_lock:
-            teams = latest_data.get('teams', {})
+        payloads = api_payloads
+        # The full team dicts are already in /api/data; only embed them on request
+        include_data = request.args.get('full', '').lower() in ('1', 'true', 'yes')
+        if not include_data:
+            payload = payloads.get(f'comparison:{team1}:{team2}')
+            if payload is not None:
+                return payload_response(payload, payloads.last_modified, payloads.version)
         
+        teams = payloads.document['data'].get('teams', {})
         if not teams:
             return jsonify({'error': 'No team data available'}), 503
             
-        comparison_data = data_processor.compare_teams(teams, team1, team2)
+        comparison_data = data_processor.compare_teams(teams, team1, team2, include_data=include_data)
         
         return jsonify(comparison_data)
     except Exception as e:
         print(f"Error in team comparison: {e}")
         return jsonify({'error': f'Error loading comparison data: {str(e)}'}), 500
 
+HISTORY_RESOLUTIONS = ('auto', 'raw', *HistoryDatabase.ROLLUP_SECONDS)
+
+def parse_time_arg(value: Optional[str]) -> Optional[int]:
+    """Epoch seconds from an epoch or ISO 8601 query value (UTC unless it has an offset)"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def history_args() -> Dict:
+    """Window and resolution arguments for the history queries, raising ValueError on bad input"""
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in HISTORY_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(HISTORY_RESOLUTIONS)}")
+    max_points = int(request.args.get('max_points', Config.HISTORY_MAX_POINTS))
+    # LTTB always keeps the first and last point plus at least one between them
+    if max_points < 0 or 0 < max_points < 3:
+        raise ValueError('max_points must be 0 (no limit) or at least 3')
+    return {
+        'start': parse_time_arg(request.args.get('from')),
+        'end': parse_time_arg(request.args.get('to')),
+        'resolution': resolution,
+        'max_points': max_points
+    }
+
 @app.route('/api/history/player/<player_name>')
 def api_player_history(player_name):
     """Get historical data for a specific player"""
     skill = request.args.get('skill', 'overall')
-    history = db.get_player_history(player_name, skill)
+    try:
+        args = history_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    history = db.get_player_history(player_name, skill, **args)
     return jsonify(history)
 
 @app.route('/api/history/team/<team_name>')
 def api_team_history(team_name):
     """Get historical data for a specific team"""
     skill = request.args.get('skill', 'overall')
-    history = db.get_team_history(team_name.upper(), skill)
+    try:
+        args = history_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    history = db.get_team_history(team_name.upper(), skill, **args)
     return jsonify(history)
 
 @app.route('/api/players')
@@ -199,6 +420,19 @@ def api_players():
     players = db.get_all_players()
     return jsonify(players)
 
+@app.route('/api/player/<player_name>')
+def api_player(player_name):
+    """Current stats of one player in every skill"""
+    skills = api_payloads.get(f'skills:{player_name}')
+    if skills is None:
+        return jsonify({'error': 'Player not found'}), 404
+    
+    return Response(compose_object([
+        ('name', compact_dumps(player_name).encode('utf-8')),
+        ('skills', skills.body[:-1]),
+        ('team', compact_dumps(data_processor.get_team_from_name(player_name)).encode('utf-8'))
+    ]), mimetype=JSON_MIMETYPE)
+
 @app.route('/api/compare/players')
 def api_compare_players():
     """Compare two or more players"""
@@ -206,30 +440,75 @@ def api_compare_players():
     if len(player_names) < 2:
         return jsonify({'error': 'At least 2 players required for comparison'})
     
-    comparison_data = {}
-    with data_lock:
-        current_leaderboards = latest_data.get('leaderboards', {})
+    # Splice the pre-serialized stats of each player into one object
+    payloads = api_payloads
+    parts = []
+    for player_name in sorted(set(player_names)):
+        skills = payloads.get(f'skills:{player_name}')
+        parts.append((player_name, skills.body[:-1] if skills is not None else b'{}'))
     
-    for player_name in player_names:
-        player_data = {}
-        for skill in data_processor.skills:
-            # Get latest data for this player and skill
-            leaderboard = current_leaderboards.get(skill, [])
-            player_stats = next((p for p in leaderboard if p['name'] == player_name), None)
-            if player_stats:
-                player_data[skill] = player_stats
-        comparison_data[player_name] = player_data
-    
-    return jsonify(comparison_data)
+    return Response(compose_object(parts), mimetype=JSON_MIMETYPE)
 
 @app.route('/api/database/stats')
 def api_database_stats():
-    """Get database statistics for monitoring"""
+    """Get database statistics for monitoring (also exported as deadman_db_* on /metrics)"""
     try:
         stats = db.get_database_stats()
         return jsonify(stats)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics: request latencies, database and stream gauges, and the update
+    pipeline's phase timings and scrape counters (read from the worker in web mode)"""
+    text = REGISTRY.render()
+    if Config.RUN_MODE == 'web':
+        text += read_metrics_file(metrics_path_for(db))
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+def admin_denied() -> Optional[tuple]:
+    """Error response unless the request carries ADMIN_TOKEN (admin routes are hidden without one)"""
+    if not Config.ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    header = request.headers.get('Authorization', '')
+    supplied = header[len('Bearer '):] if header.startswith('Bearer ') else request.args.get('token', '')
+    if not hmac.compare_digest(supplied.encode(), Config.ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """List the newest request and cycle profiles (written by this process or the worker)"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    limit = request.args.get('limit', 20, type=int)
+    profiles = []
+    for filename in list_profiles(Config.PROFILE_DIR)[:limit]:
+        try:
+            profiles.append(describe_profile(Config.PROFILE_DIR, filename))
+        except (OSError, ValueError):
+            continue  # pruned or still being written
+    return jsonify({'enabled': Config.PROFILE_ENABLED, 'profiles': profiles})
+
+@app.route('/admin/profiles/<filename>')
+def admin_profile(filename):
+    """One profile in folded stack format, for flamegraph.pl or speedscope"""
+    denied = admin_denied()
+    if denied:
+        return denied
+    # Only names from the listing, never arbitrary paths
+    if filename not in list_profiles(Config.PROFILE_DIR):
+        return jsonify({'error': 'Profile not found'}), 404
+    with open(os.path.join(Config.PROFILE_DIR, filename)) as f:
+        return Response(f.read(), mimetype='text/plain')
+
+startup_timer.mark('routes')
+print(startup_timer.report())
+if Config.FAST_START and Config.RUN_MODE != 'web':
+    # Started last so it does not compete with the rest of the import
+    startup_thread.start()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8080) 
\ No newline at end of file
@@ -0,0 +1,168 @@
+"""
+ASGI entry point for the Deadman All Stars Hiscores application (uvicorn asgi:application).
+
+Idle and slow connections are held by the event loop instead of a thread each.
+The Flask routes run through a small WSGI bridge: routes answered from the
+in-memory payloads are cheap and never block, so they run directly on the
+loop; the rest (templates, SQLite history queries) run on a bounded thread
+pool. /api/stream is served natively so each subscriber is just a coroutine.
+"""
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import app as web_app
+from app import app as flask_app, event_broker
+from event_stream import KEEP_ALIVE_MESSAGE, RETRY_MESSAGE
+from response_cache import fields_key, parse_fields
+from config import Config
+
+# Routes that only look up or splice payloads of the current PayloadSet
+NON_BLOCKING_PATHS = {'/api/teams', '/api/leaderboards', '/api/compare/players'}
+NON_BLOCKING_PREFIXES = ('/api/team/', '/api/player/')
+
+executor = ThreadPoolExecutor(max_workers=Config.ASGI_THREADS, thread_name_prefix='wsgi')
+
+def build_environ(scope, body: bytes) -> dict:
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            # Repeated Cookie headers are one cookie list, which uses its own separator
+            value = f"{environ[name]}{'; ' if name == 'HTTP_COOKIE' else ','}{value}"
+        environ[name] = value
+    return environ
+
+def is_precomputed(path: str, query_string: bytes) -> bool:
+    """Whether the route will answer with a pre-serialized payload, so it can run on the loop.
+
+    /api/data and /api/comparison do too for most requests, but build a projection
+    and patch, or compare teams, when the selection was not prepared for the version.
+    """
+    if path in NON_BLOCKING_PATHS or path.startswith(NON_BLOCKING_PREFIXES):
+        return True
+    if path not in ('/api/data', '/api/comparison'):
+        return False
+    args = {name: values[0] for name, values in parse_qs(query_string.decode('latin1')).items()}
+    payloads = web_app.api_payloads
+    if path == '/api/data':
+        fields = parse_fields(args.get('fields', ''))
+        return not fields or payloads.get(f'fields:{fields_key(fields)}') is not None
+    if args.get('full', '').lower() in ('1', 'true', 'yes'):
+        return False
+    team1, team2 = args.get('team1', '').upper(), args.get('team2', '').upper()
+    return payloads.get(f'comparison:{team1}:{team2}') is not None
+
+def call_wsgi(environ: dict):
+    """Run the Flask app to completion, returning (status, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        # uvicorn adds its own Date header; Werkzeug's (from make_conditional) would be a second one
+        response['headers'] = [(name.lower().encode('latin1'), value.encode('latin1'))
+                               for name, value in headers if name.lower() != 'date']
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], body
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def serve_wsgi(scope, receive, send):
+    environ = build_environ(scope, await read_body(receive))
+    if is_precomputed(scope['path'], scope['query_string']):
+        status, headers, body = call_wsgi(environ)
+    else:
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(executor, call_wsgi, environ)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def serve_stream(scope, receive, send):
+    """Native /api/stream: one coroutine per subscriber instead of one thread"""
+    subscriber = event_broker.subscribe_async(asyncio.get_running_loop())
+    if subscriber is None:
+        await send({'type': 'http.response.start', 'status': 503,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body',
+                    'body': b'{"error":"Too many live update subscribers, fall back to polling"}\n'})
+        return
+
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        message = RETRY_MESSAGE
+        while True:
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+            getter = asyncio.ensure_future(subscriber.get())
+            done, _ = await asyncio.wait({getter, disconnected}, timeout=Config.STREAM_HEARTBEAT,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                message = getter.result()
+                continue
+            getter.cancel()
+            if disconnected in done:
+                return
+            message = KEEP_ALIVE_MESSAGE
+    finally:
+        disconnected.cancel()
+        event_broker.unsubscribe(subscriber)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/stream' and Config.STREAM_ENABLED:
+        await serve_stream(scope, receive, send)
+    elif scope['type'] == 'http':
+        await serve_wsgi(scope, receive, send)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent /api/data reads during data refreshes: the previous
+lock-guarded handler (jsonify under data_lock) versus the lock-free swap of
+immutable pre-serialized payload sets
+"""
+
+import contextlib
+import io
+import sys
+import threading
+import time
+from datetime import datetime
+from flask import Flask, jsonify
+from bench_processor import synthetic_raw_data
+from data_processor import DataProcessor
+from response_cache import PayloadBuilder, compact_dumps, payload_response
+
+REFRESH_INTERVAL = 0.25  # seconds; far more often than the real 15 minutes
+
+def processed_versions(player_count: int, count: int):
+    """Distinct processed data versions to cycle through as refreshes"""
+    processor = DataProcessor()
+    versions = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for seed in range(count):
+            versions.append(processor.process_data(synthetic_raw_data(player_count, seed=seed)))
+    return versions
+
+def locked_app(versions):
+    """The previous design: one global dict guarded by data_lock, serialized per request"""
+    app = Flask('locked')
+    state = {'data': versions[0], 'last_update': datetime.now()}
+    data_lock = threading.Lock()
+
+    @app.route('/api/data')
+    def api_data():
+        with data_lock:
+            return jsonify({'data': state['data'], 'last_update': state['last_update'].isoformat()})
+
+    def refresh(data):
+        with data_lock:
+            state['data'] = data
+            state['last_update'] = datetime.now()
+
+    return app, refresh
+
+def swapped_app(versions):
+    """The current design: immutable payload sets published by reference assignment"""
+    app = Flask('swapped')
+    builder = PayloadBuilder(compact_dumps, DataProcessor())
+    state = {'payloads': builder.build(versions[0], datetime.now())}
+
+    @app.route('/api/data')
+    def api_data():
+        payloads = state['payloads']
+        return payload_response(payloads.get('data'), payloads.last_modified, payloads.version)
+
+    def refresh(data):
+        state['payloads'] = builder.build(data, datetime.now())
+
+    return app, refresh
+
+def hammer(app, refresh, versions, threads: int, duration: float):
+    """Return (requests per second, p99 latency ms) while refreshing continuously"""
+    stop = threading.Event()
+    latencies = [[] for _ in range(threads)]
+
+    def client(index):
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get('/api/data')
+            response.get_data()
+            latencies[index].append(time.perf_counter() - start)
+
+    def refresher():
+        refreshes = 0
+        while not stop.is_set():
+            refresh(versions[refreshes % len(versions)])
+            refreshes += 1
+            time.sleep(REFRESH_INTERVAL)
+
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=refresher))
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    merged = sorted(latency for per_thread in latencies for latency in per_thread)
+    return len(merged) / duration, merged[int(len(merged) * 0.99)] * 1000
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    versions = processed_versions(player_count, 4)
+
+    print(f"/api/data with {player_count} players, refreshing every {REFRESH_INTERVAL * 1000:.0f} ms, "
+          f"{duration:.0f}s per run")
+    print(f"{'threads':>8}{'locked req/s':>15}{'swapped req/s':>15}{'speedup':>10}{'locked p99 ms':>15}{'swapped p99 ms':>16}")
+    print("-" * 79)
+    for threads in (1, 4, 16):
+        locked_rate, locked_p99 = hammer(*locked_app(versions), versions, threads, duration)
+        swapped_rate, swapped_p99 = hammer(*swapped_app(versions), versions, threads, duration)
+        print(f"{threads:>8}{locked_rate:>15,.0f}{swapped_rate:>15,.0f}{swapped_rate / locked_rate:>9.1f}x"
+              f"{locked_p99:>15.1f}{swapped_p99:>16.1f}")
+
+if __name__ == "__main__":
+    main()
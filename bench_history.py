@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark player history queries on the legacy player_history table versus the
+normalized player_points table, at 1M+ data points
+"""
+
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from database import HistoryDatabase
+from data_processor import DataProcessor
+
+LEGACY_QUERY = '''
+    SELECT timestamp, level, xp, rank
+    FROM player_history
+    WHERE player_name = ? AND skill = ?
+    ORDER BY timestamp ASC
+'''
+
+def populate_legacy(db_path: str, players: int, cycles: int):
+    """Fill the legacy player_history table with synthetic 15-minute samples"""
+    processor = DataProcessor()
+    teams = list(processor.team_prefixes.keys())
+    names = [(f"{teams[i % len(teams)]} Player{i}", teams[i % len(teams)]) for i in range(players)]
+    start = int(time.time()) - cycles * 900
+
+    conn = sqlite3.connect(db_path)
+    for cycle in range(cycles):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + cycle * 900))
+        conn.executemany(
+            'INSERT INTO player_history (timestamp, player_name, team, skill, level, xp, rank) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(timestamp, name, team, skill, 50, cycle * 1000 + i, i + 1)
+             for i, (name, team) in enumerate(names) for skill in processor.skills]
+        )
+    conn.commit()
+    conn.close()
+    return [name for name, _ in names], processor.skills
+
+def time_queries(func, samples):
+    """Return per-query latencies in milliseconds"""
+    latencies = []
+    for args in samples:
+        start = time.perf_counter()
+        func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def report(label: str, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28}{statistics.median(latencies):>10.3f}{p95:>10.3f}{max(latencies):>10.3f}")
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 420
+    queries = 300
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench_history.db')
+        with redirect_stdout(StringIO()):
+            db = HistoryDatabase(db_path)
+
+        print(f"Generating {players} players x 24 skills x {cycles} cycles "
+              f"= {players * 24 * cycles:,} legacy rows...")
+        start = time.perf_counter()
+        names, skills = populate_legacy(db_path, players, cycles)
+        print(f"  done in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        result = db.migrate_player_history()
+        print(f"Migrated {result['migrated_rows']:,} rows to player_points in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(7)
+        samples = [(rng.choice(names), rng.choice(skills)) for _ in range(queries)]
+
+        legacy_conn = sqlite3.connect(db_path)
+        legacy = time_queries(lambda name, skill: legacy_conn.execute(LEGACY_QUERY, (name, skill)).fetchall(), samples)
+        normalized = time_queries(db.get_player_history, samples)
+        legacy_conn.close()
+
+        print(f"\n{queries} history queries, {cycles} points each (ms)")
+        print(f"{'':<28}{'median':>10}{'p95':>10}{'max':>10}")
+        report('legacy player_history', legacy)
+        report('player_points (normalized)', normalized)
+
+        db.close()
+        conn = sqlite3.connect(db_path)
+        if _has_dbstat(conn):
+            sizes = dict(conn.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name').fetchall())
+            legacy_bytes = sum(size for name, size in sizes.items() if 'player_history' in name)
+            points_bytes = sum(size for name, size in sizes.items() if 'player_points' in name)
+            print(f"\nStorage incl. indexes: player_history {legacy_bytes / 1024 / 1024:.1f} MB, "
+                  f"player_points {points_bytes / 1024 / 1024:.1f} MB")
+        conn.close()
+
+def _has_dbstat(conn) -> bool:
+    try:
+        conn.execute('SELECT 1 FROM dbstat LIMIT 1')
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the HTML parser backends over the saved hiscore fixtures
+"""
+
+import os
+import sys
+import time
+from scraper import DeadmanScraper
+from html_parsers import PARSERS, LXML_AVAILABLE
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def time_parse(func, repeat: int) -> float:
+    """Return the best per-call time in milliseconds over several rounds"""
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    backends = [name for name in PARSERS if name != 'lxml' or LXML_AVAILABLE]
+    scrapers = {name: DeadmanScraper(parser=name) for name in backends}
+
+    print(f"Parsing each fixture {repeat}x per round, best of 5 rounds")
+    print(f"{'fixture':<28}" + ''.join(f"{name + ' (ms)':>14}" for name in backends) + f"{'speedup':>10}")
+    print("-" * (28 + 14 * len(backends) + 10))
+
+    for filename in sorted(os.listdir(FIXTURES_DIR)):
+        if not filename.endswith('.html'):
+            continue
+        with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+            content = f.read()
+
+        timings = {}
+        results = {}
+        for name, scraper in scrapers.items():
+            if filename.startswith('hiscorepersonal'):
+                func = lambda s=scraper: s.parser.iter_rows(content)
+            else:
+                skill = filename.split('_')[0]
+                func = lambda s=scraper: s.parse_skill_page(content, skill)
+            results[name] = func()
+            timings[name] = time_parse(func, repeat)
+
+        # Both backends must agree on the extracted rows
+        if len({repr(r) for r in results.values()}) != 1:
+            print(f"WARNING: backends disagree on {filename}")
+
+        speedup = timings['soup'] / timings['lxml'] if 'lxml' in timings else 1.0
+        print(f"{filename:<28}" + ''.join(f"{timings[name]:>14.3f}" for name in backends) + f"{speedup:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
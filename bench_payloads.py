@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Report API payload sizes for the full documents versus the field projections
+each page requests and the slim team comparison
+"""
+
+import contextlib
+import io
+import sys
+from bench_processor import synthetic_raw_data
+from data_processor import DataProcessor
+from response_cache import PAGE_FIELDS, compact_dumps, parse_fields, project, serialize_payload
+
+def gzip_size(payload) -> int:
+    # Small bodies are sent uncompressed
+    return len(payload.gzip_body if payload.gzip_body is not None else payload.body)
+
+def report(label: str, before, after):
+    before = serialize_payload(before, compact_dumps)
+    after = serialize_payload(after, compact_dumps)
+    print(f"{label:<34}{len(before.body):>10,}{len(after.body):>10,}"
+          f"{gzip_size(before):>10,}{gzip_size(after):>10,}"
+          f"{1 - len(after.body) / len(before.body):>9.0%}")
+
+def main():
+    player_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    processor = DataProcessor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = processor.process_data(synthetic_raw_data(player_count))
+    document = {'data': data, 'last_update': None}
+
+    print(f"Payload sizes in bytes for {player_count} players")
+    print(f"{'endpoint':<34}{'before':>10}{'after':>10}{'gz before':>10}{'gz after':>10}{'saved':>9}")
+    print("-" * 83)
+    for page, fields in PAGE_FIELDS.items():
+        projected = {'data': project(data, parse_fields(fields)), 'last_update': None}
+        report(f"/api/data ({page} page)", document, projected)
+
+    team1, team2 = list(data['teams'])[:2]
+    report(f"/api/comparison ({team1} vs {team2})",
+           processor.compare_teams(data['teams'], team1, team2, include_data=True),
+           processor.compare_teams(data['teams'], team1, team2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of update cycles against the local fake hiscores server:
+scrape_all_data -> processing -> payload build -> database save, with wall
+time, request rate and a per-phase breakdown for every cycle
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from collections import defaultdict
+from data_processor import DataProcessor
+from database import HistoryDatabase
+from fake_hiscores import FakeHiscores
+from pipeline import UpdatePipeline
+from response_cache import PayloadBuilder, compact_dumps
+from scraper import DeadmanScraper
+
+PHASES = ['scrape', 'process', 'publish', 'save']
+
+def timed(func, phase: str, timings: dict):
+    """Wrap func so its run time is added to timings[phase]"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[phase] += time.perf_counter() - start
+    return wrapper
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cycles', type=int, default=5, help='update cycles to run')
+    parser.add_argument('--players', type=int, help='synthetic roster size (default: the recorded roster)')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the fake host takes per response')
+    parser.add_argument('--jitter', type=float, default=0.02, help='random +/- seconds on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--etags', action='store_true', help='fake host sends ETags and answers 304')
+    parser.add_argument('--unchanged', action='store_true', help='keep the hiscores the same between cycles')
+    parser.add_argument('--workers', type=int, help='scraper workers (default: SCRAPE_MAX_WORKERS)')
+    parser.add_argument('--rate-limit', type=float, default=0, help='scraper requests/s cap (0: unlimited)')
+    args = parser.parse_args()
+
+    hiscores = FakeHiscores(args.players, args.latency, args.jitter, args.error_rate, args.etags)
+    server = hiscores.serve()
+    scraper = DeadmanScraper(max_workers=args.workers, rate_limit=args.rate_limit, base_url=hiscores.base_url)
+    processor = DataProcessor()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = HistoryDatabase(os.path.join(tmp, 'bench_pipeline.db'))
+        # Development mode skips saves shortly after earlier ones; every cycle should write here
+        db.is_production = True
+
+        timings = defaultdict(float)
+        builder = PayloadBuilder(compact_dumps, processor)
+        scraper.scrape_all_data = timed(scraper.scrape_all_data, 'scrape', timings)
+        processor.process_data = timed(processor.process_data, 'process', timings)
+        processor.process_data_incremental = timed(processor.process_data_incremental, 'process', timings)
+        db.save_cycle = timed(db.save_cycle, 'save', timings)
+        on_update = timed(builder.build, 'publish', timings)
+        pipeline = UpdatePipeline(scraper, processor, db, on_update=on_update)
+
+        print(f"{len(hiscores.names)} players, {scraper.max_workers} workers, "
+              f"{args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms latency, {args.error_rate:.0%} errors")
+        print(f"{'cycle':>6}{'wall s':>9}{'requests':>10}{'req/s':>8}{'errors':>8}"
+              + ''.join(f"{phase + ' ms':>12}" for phase in PHASES) + f"{'changed':>9}")
+        print("-" * (49 + 12 * len(PHASES) + 9))
+
+        totals = defaultdict(float)
+        for cycle in range(1, args.cycles + 1):
+            if cycle > 1 and not args.unchanged:
+                hiscores.advance()
+            timings.clear()
+            requests_before, errors_before = hiscores.requests, hiscores.errors
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.run_once()
+            wall = time.perf_counter() - start
+            requests = hiscores.requests - requests_before
+            errors = hiscores.errors - errors_before
+
+            print(f"{cycle:>6}{wall:>9.2f}{requests:>10}{requests / wall:>8.1f}{errors:>8}"
+                  + ''.join(f"{timings[phase] * 1000:>12.1f}" for phase in PHASES)
+                  + f"{len(scraper.changed_skills):>9}")
+            totals['wall'] += wall
+            totals['requests'] += requests
+            for phase in PHASES:
+                totals[phase] += timings[phase]
+
+        print("-" * (49 + 12 * len(PHASES) + 9))
+        print(f"{'mean':>6}{totals['wall'] / args.cycles:>9.2f}{totals['requests'] / args.cycles:>10.0f}"
+              f"{totals['requests'] / totals['wall']:>8.1f}{'':>8}"
+              + ''.join(f"{totals[phase] / args.cycles * 1000:>12.1f}" for phase in PHASES))
+        db.close()
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark the loop and columnar (pandas) DataProcessor backends on synthetic rosters
+"""
+
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+from data_processor import DataProcessor
+
+def synthetic_raw_data(player_count: int, seed: int = 42) -> dict:
+    """Build a raw scrape of player_count players spread over the six teams"""
+    rng = random.Random(seed)
+    processor = DataProcessor()
+    prefixes = list(processor.team_prefixes.keys())
+    names = [f"{prefixes[i % len(prefixes)]} Player{i}" for i in range(player_count)]
+
+    raw_data = {}
+    for skill in processor.skills:
+        players = []
+        for name in names:
+            level = rng.randint(1, 2277 if skill == 'overall' else 99)
+            players.append({'rank': 0, 'name': name, 'level': level, 'xp': level * rng.randint(50, 5000), 'skill': skill})
+        players.sort(key=lambda p: (p['level'], p['xp']), reverse=True)
+        for rank, player in enumerate(players, 1):
+            player['rank'] = rank
+        raw_data[skill] = players
+    return raw_data
+
+def time_backend(backend: str, raw_data: dict, repeat: int):
+    """Return (best seconds, result) for processing raw_data with a backend"""
+    processor = DataProcessor(backend=backend)
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = processor.process_data(raw_data)
+            best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [30, 10_000, 100_000]
+
+    print(f"{'players':>10}{'rows':>12}{'loop (s)':>12}{'frame (s)':>12}{'speedup':>10}  same output")
+    print("-" * 70)
+    for size in sizes:
+        raw_data = synthetic_raw_data(size)
+        rows = sum(len(players) for players in raw_data.values())
+        repeat = 5 if size <= 10_000 else 3  # Single runs of the large sizes vary by ±30% here
+        loop_time, loop_result = time_backend('loop', raw_data, repeat)
+        frame_time, frame_result = time_backend('frame', raw_data, repeat)
+        same = json.dumps(loop_result) == json.dumps(frame_result)
+        print(f"{size:>10,}{rows:>12,}{loop_time:>12.4f}{frame_time:>12.4f}{loop_time / frame_time:>9.1f}x  {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark player history chart queries over growing windows: every raw point
+versus the auto-selected rollup table downsampled to the point budget
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from database import HistoryDatabase
+from data_processor import DataProcessor
+
+DAY = 86400
+
+def populate(db: HistoryDatabase, players: int, days: int):
+    """Fill player_points with 15-minute samples ending now and build the rollups"""
+    skills = DataProcessor().skills
+    names = [f"SNA Player{i}" for i in range(players)]
+    end = int(time.time())
+    start = end - days * DAY
+    with db._write_connection() as conn:
+        cursor = conn.cursor()
+        player_ids, skill_ids = db._ensure_dimensions(cursor, {skill: [{'name': name} for name in names] for skill in skills})
+        rng = random.Random(3)
+        for name in names:
+            for skill in skills:
+                xp = 0
+                rows = []
+                for ts in range(start, end, db.RAW_INTERVAL):
+                    xp += rng.randrange(0, 5000)
+                    rows.append((player_ids[name], skill_ids[skill], ts, 50, xp, 1))
+                cursor.executemany('INSERT INTO player_points (player_id, skill_id, ts, level, xp, rank) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        db._rebuild_rollups(cursor)
+    return names, skills, end
+
+def median_ms(func, samples) -> float:
+    latencies = []
+    for args in samples:
+        start = time.perf_counter()
+        points = func(*args)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies), len(points)
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 56
+    queries = 30
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with redirect_stdout(StringIO()):
+            db = HistoryDatabase(os.path.join(tmp, 'bench_rollups.db'))
+        print(f"Generating {players} players x 24 skills x {days} days of 15-minute samples...")
+        start = time.perf_counter()
+        names, skills, end = populate(db, players, days)
+        print(f"  done in {time.perf_counter() - start:.1f}s")
+
+        rng = random.Random(7)
+        samples = [(rng.choice(names), rng.choice(skills)) for _ in range(queries)]
+
+        print(f"\nMedian of {queries} history queries (ms) and points returned, budget 500 points")
+        print(f"{'window':>8}{'raw ms':>10}{'raw points':>12}{'auto ms':>10}{'auto points':>13}")
+        print("-" * 53)
+        windows = [2 ** i for i in range(days.bit_length()) if 2 ** i < days] + [days]
+        for window in windows:
+            since = end - window * DAY
+            raw_ms, raw_points = median_ms(
+                lambda name, skill: db.get_player_history(name, skill, start=since), samples)
+            auto_ms, auto_points = median_ms(
+                lambda name, skill: db.get_player_history(name, skill, start=since, resolution='auto', max_points=500), samples)
+            print(f"{window:>7}d{raw_ms:>10.2f}{raw_points:>12,}{auto_ms:>10.2f}{auto_points:>13,}")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold starts of run.py: time until the port accepts connections and
+until /api/data serves the saved data, with the default startup and FAST_START,
+plus the app's own startup phase report and the slowest imports
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from fake_hiscores import FakeHiscores
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODES = {'default': {'FAST_START': 'false'}, 'fast': {'FAST_START': 'true'}}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def has_data(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/data', timeout=1) as response:
+            return bool(json.loads(response.read()).get('data'))
+    except OSError:
+        return False
+
+def start_once(workdir: str, env: dict, timeout: float = 60) -> dict:
+    """Start run.py and time it until it listens and until it serves data"""
+    port = free_port()
+    lines = []
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'run.py')], cwd=workdir,
+                               env=dict(env, PORT=str(port), HOST='127.0.0.1'), text=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    threading.Thread(target=lambda: lines.extend(process.stdout), daemon=True).start()
+    result = {}
+    try:
+        while 'data' not in result:
+            elapsed = time.perf_counter() - start
+            if elapsed > timeout or process.poll() is not None:
+                raise RuntimeError('server did not start:\n' + ''.join(lines[-20:]))
+            if 'listening' not in result:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                    result['listening'] = time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.005)
+                    continue
+            if has_data(port):
+                result['data'] = time.perf_counter() - start
+            else:
+                time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = next((line for line in lines if 'Startup:' in line), '')
+    ready = re.search(r'ready (\d+) ms', report)
+    result['app'] = int(ready.group(1)) / 1000 if ready else float('nan')
+    result['report'] = report.strip()
+    return result
+
+def slowest_imports(workdir: str, env: dict, count: int):
+    """Top-level modules by cumulative import time when importing the app"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app, os; os._exit(0)'],
+                            cwd=workdir, env=env, capture_output=True, text=True).stderr
+    # Each module is listed after its own imports, indented two spaces per level
+    children, timings = [], []
+    for line in output.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', line)
+        if not match:
+            continue
+        seconds, depth, module = int(match.group(1)) / 1_000_000, len(match.group(2)) // 2, match.group(3)
+        if depth == 1:
+            children.append((seconds, module))
+        elif depth == 0:
+            if module == 'app':
+                timings = children
+            children = []
+    return sorted(timings, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='timed starts per mode')
+    parser.add_argument('--imports', type=int, default=8, help='slowest app imports to list (0: none)')
+    args = parser.parse_args()
+
+    # A local hiscores host keeps the startup scrape off the network
+    hiscores = FakeHiscores()
+    server = hiscores.serve()
+    server.handle_error = lambda request, client_address: None  # Stopped servers drop their scrape mid-request
+    base_env = dict(os.environ, HISCORES_BASE_URL=hiscores.base_url, FLASK_ENV='production', RUN_MODE='combined',
+                    PYTHONPATH=ROOT)
+    base_env.pop('RENDER', None)
+
+    print(f"{'mode':<10}{'listening ms':>14}{'data ms':>10}{'app ready ms':>14}")
+    print("-" * 48)
+    reports = {}
+    for mode, overrides in MODES.items():
+        env = dict(base_env, **overrides)
+        with tempfile.TemporaryDirectory() as workdir:
+            # Each mode starts from its own copy of the saved history
+            shutil.copy(os.path.join(ROOT, 'deadman_history.db'), workdir)
+            start_once(workdir, env)  # Untimed: runs migrations and persists the payload file
+            runs = [start_once(workdir, env) for _ in range(args.runs)]
+            if args.imports and mode == 'fast':
+                # Web mode imports what a fast start imports before serving, without a startup
+                # thread whose own imports would scramble the nesting in the report
+                imports = slowest_imports(workdir, dict(env, RUN_MODE='web'), args.imports)
+        medians = {key: statistics.median(run[key] for run in runs) * 1000 for key in ('listening', 'data', 'app')}
+        print(f"{mode:<10}{medians['listening']:>14.0f}{medians['data']:>10.0f}{medians['app']:>14.0f}")
+        reports[mode] = runs[-1]['report']
+    print()
+    for mode, report in reports.items():
+        print(f"{mode:<10}{report}")
+
+    if args.imports:
+        print("\nSlowest imports of app.py before it serves (FAST_START):")
+        for seconds, module in imports:
+            print(f"{seconds * 1000:>8.1f} ms  {module}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,47 @@ class Config:
     PORT = int(os.environ.get('PORT', 8080))
     HOST = os.environ.get('HOST', '0.0.0.0')
     
+    # Scraper settings
+    HISCORES_BASE_URL = os.environ.get('HISCORES_BASE_URL', 'https://secure.runescape.com/m=hiscore_oldschool_tournament')  # point at fake_hiscores.py to test offline
+    SCRAPE_MAX_WORKERS = int(os.environ.get('SCRAPE_MAX_WORKERS', 8))  # concurrent page fetches
+    SCRAPE_RATE_LIMIT = float(os.environ.get('SCRAPE_RATE_LIMIT', 10))  # requests per second to the hiscores host
+    SCRAPE_BURST = int(os.environ.get('SCRAPE_BURST', 5))  # requests allowed back-to-back before throttling
+    HTML_PARSER = os.environ.get('HTML_PARSER', 'lxml')  # 'lxml' (C-backed) or 'soup' (BeautifulSoup html.parser)
+    
+    # Processing settings
+    PROCESSOR_BACKEND = os.environ.get('PROCESSOR_BACKEND', 'loop')  # 'loop' or 'frame' (columnar pandas core; only pays off past ~50k players, see bench_processor.py)
+    
+    # Live update stream settings
+    STREAM_MAX_SUBSCRIBERS = int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 500))  # concurrent /api/stream clients
+    STREAM_HEARTBEAT = int(os.environ.get('STREAM_HEARTBEAT', 20))  # seconds between keep-alive comments
+    STREAM_ENABLED = os.environ.get('STREAM_ENABLED', 'true') == 'true'  # pages subscribe to /api/stream; set false under servers that cannot hold streams open (gunicorn sync workers)
+    PATCH_HISTORY = int(os.environ.get('PATCH_HISTORY', 8))  # data versions /api/data?since= can patch from
+    
+    # History settings
+    HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS', 500))  # default point budget of /api/history responses
+    
+    # Process layout settings
+    RUN_MODE = os.environ.get('RUN_MODE', 'combined')  # 'combined' (web app scrapes too) or 'web' (serve only, run worker.py)
+    UPDATE_NOTIFY_FILE = os.environ.get('UPDATE_NOTIFY_FILE')  # touched by the worker after each save; defaults to <database>.updated
+    WEB_POLL_INTERVAL = int(os.environ.get('WEB_POLL_INTERVAL', 5))  # seconds between web mode checks for new data
+    SHARED_PAYLOADS_FILE = os.environ.get('SHARED_PAYLOADS_FILE')  # payloads the worker publishes for web processes; defaults to <database>.payloads
+    WORKER_METRICS_FILE = os.environ.get('WORKER_METRICS_FILE')  # worker metrics included in the web /metrics; defaults to <database>.metrics
+    
+    # Server settings
+    SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi')  # 'wsgi' (threaded Flask server) or 'asgi' (uvicorn event loop, see asgi.py)
+    ASGI_WORKERS = int(os.environ.get('ASGI_WORKERS', 1))  # uvicorn worker processes; more than 1 needs RUN_MODE=web
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))  # per-worker threads for page and database routes
+    FAST_START = os.environ.get('FAST_START') == 'true'  # serve the last persisted payloads at once; set up scraping after startup
+    
+    # Profiling settings
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED') == 'true'  # opt-in sampling profiler; nothing is hooked in when off
+    PROFILE_REQUEST_RATE = float(os.environ.get('PROFILE_REQUEST_RATE', 0.01))  # fraction of web requests profiled
+    PROFILE_CYCLE_EVERY = int(os.environ.get('PROFILE_CYCLE_EVERY', 10))  # profile every Nth update cycle (0: none)
+    PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))  # seconds between stack samples
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')  # where .folded profiles are written
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))  # newest profiles kept on disk
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # bearer token for /admin endpoints; they answer 404 when unset
+    
     # Production settings
     DEBUG = os.environ.get('FLASK_ENV') != 'production'
     
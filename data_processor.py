@@ -1,10 +1,16 @@
-import pandas as pd
-import numpy as np
-from typing import Dict, List, Any
+from typing import TYPE_CHECKING, Dict, List, Any, Tuple
 from collections import defaultdict
+from operator import itemgetter
+from config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, backend: str = None):
+        # 'loop' processes per-skill Python lists, 'frame' uses one columnar pandas table
+        self.backend = (backend or Config.PROCESSOR_BACKEND).lower()
+        
         self.team_prefixes = {
             'BB': 'B0aty Brawlers',
             'DN': 'Dino Nuggets', 
@@ -63,102 +69,298 @@ class DataProcessor:
             }
         
         # Process each skill
-        for skill, players_data in raw_data.items():
+        if self.backend == 'frame':
+            self._process_skills_frame(processed_data, raw_data)
+        else:
+            team_names = {team_code: set() for team_code in self.team_prefixes}
+            for skill, players_data in raw_data.items():
+                if not players_data:
+                    print(f"Skipping {skill} - no data")
+                    continue
+                self._process_skill(processed_data, skill, players_data, team_names)
+        
+        # Only proceed with rankings and stats if we have valid team data
+        if any(team_data['players'] for team_data in processed_data['teams'].values()):
+            # Calculate team rankings based on total XP
+            self._calculate_team_rankings(processed_data)
+            
+            # Calculate overall statistics
+            self._calculate_overall_stats(processed_data)
+            
+            print(f"Data processing completed successfully for {len(processed_data['teams'])} teams")
+        else:
+            print("Warning: No valid team data found after processing")
+        
+        return processed_data
+
+    def process_data_incremental(self, previous_data: Dict, raw_data: Dict, changed_skills) -> Dict:
+        """Update a previously processed result using only the skills whose rows changed.
+        
+        The previous result is not modified (it may still be served to readers); the team
+        and leaderboard containers are copied and only the changed skills are recomputed.
+        """
+        if not previous_data or not previous_data.get('teams'):
+            return self.process_data(raw_data)
+        
+        # Same as a full rebuild: a scrape with no usable skill at all is rejected
+        if not any(raw_data.values()):
+            print("Warning: No valid skill data found in raw data")
+            return {}
+        
+        changed = [skill for skill in raw_data if skill in changed_skills]
+        if not changed:
+            return previous_data
+        
+        print(f"Incrementally processing {len(changed)} changed skills: {', '.join(changed)}")
+        
+        processed_data = {
+            'teams': {},
+            'leaderboards': dict(previous_data['leaderboards']),
+            'overall_stats': {},
+            'last_updated': previous_data.get('last_updated')
+        }
+        for team_code, team_data in previous_data['teams'].items():
+            team_copy = dict(team_data)
+            for key in ('averages', 'totals', 'best_players', 'rankings', 'players_by_skill'):
+                if key in team_copy:
+                    team_copy[key] = dict(team_copy[key])
+            processed_data['teams'][team_code] = team_copy
+        # Players who left the hiscores must leave the teams too, so the players lists
+        # come from the whole scrape, not the previous result
+        team_names = self._collect_players(processed_data, raw_data)
+        
+        for skill in changed:
+            players_data = raw_data[skill]
             if not players_data:
+                # Skill failed this cycle: drop it like a full rebuild would
                 print(f"Skipping {skill} - no data")
+                processed_data['leaderboards'].pop(skill, None)
+                for team_data in processed_data['teams'].values():
+                    for key in ('averages', 'totals', 'best_players'):
+                        team_data[key].pop(skill, None)
+                    team_data.get('players_by_skill', {}).pop(skill, None)
                 continue
-                
-            # Initialize leaderboard for this skill
-            processed_data['leaderboards'][skill] = []
-            
-            # Group players by team
-            team_players = defaultdict(list)
-            
-            for player in players_data:
+            self._process_skill(processed_data, skill, players_data, team_names)
+        
+        # A full rebuild only adds players_by_skill to teams with players in some skill
+        for team_data in processed_data['teams'].values():
+            if team_data.get('players_by_skill') == {}:
+                del team_data['players_by_skill']
+        
+        self._calculate_team_rankings(processed_data, changed)
+        self._calculate_overall_stats(processed_data)
+        
+        return processed_data
+
+    def _collect_players(self, processed_data: Dict, raw_data: Dict) -> Dict[str, set]:
+        """Rebuild each team's players list from every skill of the scrape, in the order a
+        full rebuild adds them; returns the names in each team"""
+        team_names = {team_code: set() for team_code in processed_data['teams']}
+        for team_data in processed_data['teams'].values():
+            team_data['players'] = []
+        for players_data in raw_data.values():
+            for player in players_data or ():
                 team = self.get_team_from_name(player['name'])
-                if team != "Unknown":
-                    team_players[team].append(player)
-                    
-                    # Add to leaderboard
-                    processed_data['leaderboards'][skill].append({
-                        'name': player['name'],
-                        'team': team,
-                        'level': player['level'],
-                        'xp': player['xp'],
-                        'rank': player['rank']
-                    })
-            
-            # Sort leaderboard by level first, then XP (both descending)
-            processed_data['leaderboards'][skill].sort(key=lambda x: (x['level'], x['xp']), reverse=True)
+                names = team_names.get(team)
+                if names is not None and player['name'] not in names:
+                    processed_data['teams'][team]['players'].append({'name': player['name'], 'team': team})
+                    names.add(player['name'])
+        return team_names
+
+    def _process_skill(self, processed_data: Dict, skill: str, players_data: List[Dict], team_names: Dict[str, set]):
+        """Build the leaderboard and per-team aggregates of one skill.
+        
+        team_names holds the names already in each team's players list and is kept up to date.
+        """
+        leaderboard = []
+        
+        # Group players by team
+        team_players = defaultdict(list)
+        
+        for player in players_data:
+            team = self.get_team_from_name(player['name'])
+            if team != "Unknown":
+                team_players[team].append(player)
+                
+                # Add to leaderboard
+                leaderboard.append({
+                    'name': player['name'],
+                    'team': team,
+                    'level': player['level'],
+                    'xp': player['xp'],
+                    'rank': player['rank']
+                })
+        
+        # Sort leaderboard by level first, then XP (both descending)
+        leaderboard.sort(key=lambda x: (x['level'], x['xp']), reverse=True)
+        processed_data['leaderboards'][skill] = leaderboard
+        
+        # Calculate team statistics for this skill
+        for team_code, team_data in processed_data['teams'].items():
+            players = team_players.get(team_code, [])
             
-            # Calculate team statistics for this skill
-            for team_code, team_data in processed_data['teams'].items():
-                players = team_players.get(team_code, [])
+            if players:
+                # Store individual player data for this skill
+                if 'players_by_skill' not in team_data:
+                    team_data['players_by_skill'] = {}
+                team_data['players_by_skill'][skill] = players
+                
+                # Update overall players list (unique players)
+                existing_names = team_names[team_code]
+                for player in players:
+                    if player['name'] not in existing_names:
+                        team_data['players'].append({
+                            'name': player['name'],
+                            'team': team_code
+                        })
+                        existing_names.add(player['name'])
+                
+                # Calculate averages
+                total_xp = sum(p['xp'] for p in players)
+                total_level = sum(p['level'] for p in players)
+                
+                team_data['averages'][skill] = {
+                    'level': round(total_level / len(players), 2),
+                    'xp': round(total_xp / len(players), 0)
+                }
+                
+                team_data['totals'][skill] = {
+                    'level': total_level,
+                    'xp': total_xp,
+                    'players': len(players)
+                }
                 
-                if players:
-                    # Store individual player data for this skill
-                    if 'players_by_skill' not in team_data:
-                        team_data['players_by_skill'] = {}
-                    team_data['players_by_skill'][skill] = players
-                    
-                    # Update overall players list (unique players)
-                    existing_names = {p.get('name') for p in team_data.get('players', [])}
-                    for player in players:
-                        if player['name'] not in existing_names:
-                            team_data['players'].append({
-                                'name': player['name'],
-                                'team': team_code
-                            })
-                            existing_names.add(player['name'])
-                    
-                    # Calculate averages
-                    avg_level = np.mean([p['level'] for p in players])
-                    avg_xp = np.mean([p['xp'] for p in players])
-                    total_xp = sum([p['xp'] for p in players])
-                    total_level = sum([p['level'] for p in players])
-                    
+                # Find best player in team for this skill (prioritize level, then XP)
+                best_player = max(players, key=lambda x: (x['level'], x['xp']))
+                team_data['best_players'][skill] = {
+                    'name': best_player['name'],
+                    'level': best_player['level'],
+                    'xp': best_player['xp'],
+                    'rank': best_player['rank']
+                }
+            else:
+                # No players found for this team in this skill
+                team_data.get('players_by_skill', {}).pop(skill, None)
+                team_data['averages'][skill] = {'level': 0, 'xp': 0}
+                team_data['totals'][skill] = {'level': 0, 'xp': 0, 'players': 0}
+                team_data['best_players'][skill] = None
+
+    def build_frame(self, raw_data: Dict) -> Tuple['pd.DataFrame', List[Dict]]:
+        """Flatten the raw scrape into one columnar table of team players.
+        
+        Returns the table and the flattened raw player dicts. Columns: pos (index into
+        the flattened rows), skill and team as categoricals, name, level, xp and rank.
+        Rows keep the scrape order within each skill.
+        """
+        # Only the frame backend needs pandas; importing it costs ~200 ms of startup otherwise
+        import numpy as np
+        import pandas as pd
+        
+        skills = [skill for skill, players in raw_data.items() if players]
+        rows = [player for skill in skills for player in raw_data[skill]]
+        count = len(rows)
+        
+        def column(field):
+            return np.fromiter(map(itemgetter(field), rows), dtype=np.int64, count=count)
+        
+        name_codes, names = pd.factorize(np.fromiter(map(itemgetter('name'), rows), dtype=object, count=count))
+        frame = pd.DataFrame({
+            'pos': np.arange(count),
+            'skill': pd.Categorical.from_codes(
+                np.repeat(np.arange(len(skills)), [len(raw_data[skill]) for skill in skills]), categories=skills
+            ),
+            'name': pd.Categorical.from_codes(name_codes, categories=names),
+            'level': column('level'),
+            'xp': column('xp'),
+            'rank': column('rank')
+        })
+        
+        # Resolve teams once per distinct name rather than once per row
+        team_by_name = [self.get_team_from_name(name) for name in frame['name'].cat.categories]
+        team_codes = pd.Categorical(team_by_name, categories=list(self.team_prefixes) + ["Unknown"])
+        frame['team'] = pd.Categorical.from_codes(
+            team_codes.codes[frame['name'].cat.codes.to_numpy()], dtype=team_codes.dtype
+        )
+        frame = frame[frame['team'] != "Unknown"]
+        
+        return frame, rows
+
+    def _process_skills_frame(self, processed_data: Dict, raw_data: Dict):
+        """Columnar equivalent of running _process_skill over every skill"""
+        for skill, players_data in raw_data.items():
+            if not players_data:
+                print(f"Skipping {skill} - no data")
+        
+        frame, rows = self.build_frame(raw_data)
+        skills = list(frame['skill'].cat.categories)
+        group_keys = ['skill', 'team']
+        
+        # Per (skill, team) aggregates in one grouped pass
+        grouped = frame.groupby(group_keys, observed=True, sort=False)
+        sums = grouped[['level', 'xp']].sum()
+        counts = grouped.size()
+        aggregates = {
+            key: (int(level), int(xp), int(counts[key]))
+            for key, level, xp in zip(sums.index, sums['level'].tolist(), sums['xp'].tolist())
+        }
+        members = grouped.indices
+        pos = frame['pos'].to_numpy()
+        
+        # Leaderboards: sort by skill, then level and XP descending (stable, like list.sort)
+        ranked = frame.sort_values(['skill', 'level', 'xp'], ascending=[True, False, False], kind='stable')
+        ranked_skills = ranked['skill'].cat.codes.to_numpy()
+        entries = [
+            {'name': name, 'team': team, 'level': level, 'xp': xp, 'rank': rank}
+            for name, team, level, xp, rank in zip(
+                ranked['name'].tolist(), ranked['team'].tolist(), ranked['level'].tolist(),
+                ranked['xp'].tolist(), ranked['rank'].tolist()
+            )
+        ]
+        bounds = ranked_skills.searchsorted(range(len(skills) + 1))
+        for code, skill in enumerate(skills):
+            processed_data['leaderboards'][skill] = entries[bounds[code]:bounds[code + 1]]
+        
+        # Best player per (skill, team) is the first row of its group in leaderboard order
+        best = ranked.groupby(group_keys, observed=True, sort=False).head(1)
+        best_players = {
+            (skill, team): {'name': name, 'level': level, 'xp': xp, 'rank': rank}
+            for skill, team, name, level, xp, rank in zip(
+                best['skill'].tolist(), best['team'].tolist(), best['name'].tolist(),
+                best['level'].tolist(), best['xp'].tolist(), best['rank'].tolist()
+            )
+        }
+        
+        # Unique players per team in order of first appearance
+        first_seen = frame.drop_duplicates('name')
+        for name, team in zip(first_seen['name'].tolist(), first_seen['team'].tolist()):
+            processed_data['teams'][team]['players'].append({'name': name, 'team': team})
+        
+        for skill in skills:
+            for team_code, team_data in processed_data['teams'].items():
+                key = (skill, team_code)
+                if key in aggregates:
+                    total_level, total_xp, count = aggregates[key]
+                    team_data.setdefault('players_by_skill', {})[skill] = [
+                        rows[i] for i in pos[members[key]].tolist()
+                    ]
                     team_data['averages'][skill] = {
-                        'level': round(avg_level, 2),
-                        'xp': round(avg_xp, 0)
+                        'level': round(total_level / count, 2),
+                        'xp': round(total_xp / count, 0)
                     }
-                    
                     team_data['totals'][skill] = {
                         'level': total_level,
                         'xp': total_xp,
-                        'players': len(players)
-                    }
-                    
-                    # Find best player in team for this skill (prioritize level, then XP)
-                    best_player = max(players, key=lambda x: (x['level'], x['xp']))
-                    team_data['best_players'][skill] = {
-                        'name': best_player['name'],
-                        'level': best_player['level'],
-                        'xp': best_player['xp'],
-                        'rank': best_player['rank']
+                        'players': count
                     }
+                    team_data['best_players'][skill] = best_players[key]
                 else:
-                    # No players found for this team in this skill
                     team_data['averages'][skill] = {'level': 0, 'xp': 0}
                     team_data['totals'][skill] = {'level': 0, 'xp': 0, 'players': 0}
                     team_data['best_players'][skill] = None
-        
-        # Only proceed with rankings and stats if we have valid team data
-        if any(team_data['players'] for team_data in processed_data['teams'].values()):
-            # Calculate team rankings based on total XP
-            self._calculate_team_rankings(processed_data)
-            
-            # Calculate overall statistics
-            self._calculate_overall_stats(processed_data)
-            
-            print(f"Data processing completed successfully for {len(processed_data['teams'])} teams")
-        else:
-            print("Warning: No valid team data found after processing")
-        
-        return processed_data
 
-    def _calculate_team_rankings(self, data: Dict):
-        """Calculate team rankings for each skill"""
-        for skill in self.skills:
+    def _calculate_team_rankings(self, data: Dict, skills: List[str] = None):
+        """Calculate team rankings for each skill (or only the given skills)"""
+        for skill in (skills if skills is not None else self.skills):
             # Get team totals for this skill
             team_totals = []
             for team_code, team_data in data['teams'].items():
@@ -230,8 +432,16 @@ class DataProcessor:
         overall_stats['stats_skill_used'] = stats_skill  # Track which skill was used
         data['overall_stats'] = overall_stats
 
-    def compare_teams(self, teams_data: Dict, team1: str, team2: str) -> Dict:
-        """Generate comparison data between two teams"""
+    def build_player_index(self, data: Dict) -> Dict[str, Dict[str, Dict]]:
+        """Index the leaderboards as player name -> skill -> stats for constant-time lookups"""
+        index = defaultdict(dict)
+        for skill, leaderboard in data.get('leaderboards', {}).items():
+            for player in leaderboard:
+                index[player['name']][skill] = player
+        return dict(index)
+
+    def compare_teams(self, teams_data: Dict, team1: str, team2: str, include_data: bool = False) -> Dict:
+        """Generate comparison data between two teams, embedding their full data if include_data"""
         if team1 not in teams_data or team2 not in teams_data:
             return {'error': 'One or both teams not found'}
         
@@ -241,17 +451,18 @@ class DataProcessor:
         comparison = {
             'team1': {
                 'code': team1,
-                'name': team1_data['name'],
-                'data': team1_data
+                'name': team1_data['name']
             },
             'team2': {
                 'code': team2,
-                'name': team2_data['name'],
-                'data': team2_data
+                'name': team2_data['name']
             },
             'skill_comparison': {},
             'summary': {}
         }
+        if include_data:
+            comparison['team1']['data'] = team1_data
+            comparison['team2']['data'] = team2_data
         
         # Compare each skill
         team1_wins = 0
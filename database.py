@@ -1,12 +1,37 @@
 import sqlite3
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from contextlib import contextmanager
+from pathlib import Path
 import os
 import hashlib
+import queue
+import threading
+import zlib
+from downsample import lttb
+from metrics import DB_ROWS_INSERTED
 
 class HistoryDatabase:
-    def __init__(self, db_path: str = None):
+    # Connection tuning applied to every pooled connection
+    PRAGMAS = {
+        'synchronous': 'NORMAL',  # Safe with WAL, one fsync per checkpoint instead of per commit
+        'cache_size': -16000,  # 16 MB page cache
+        'mmap_size': 64 * 1024 * 1024,  # Memory-map the first 64 MB of the file for reads
+        'temp_store': 'MEMORY'
+    }
+    BUSY_TIMEOUT = 10  # Seconds to wait for a lock before raising
+    READ_POOL_SIZE = 8  # Idle read-only connections kept for reuse
+    SNAPSHOT_ENCODING = 'zlib-json'  # How new snapshots are stored: 'json' (plain text) or 'zlib-json'
+    SNAPSHOT_COMPRESSION_LEVEL = 9
+    # Rollup tables keep the last sample of each bucket, maintained as cycles are saved
+    ROLLUP_SECONDS = {'hourly': 3600, 'daily': 86400}
+    RAW_INTERVAL = 900  # Nominal seconds between raw samples, used to estimate point counts
+    ROLLUP_OVERSAMPLE = 4  # Read up to this many times the point budget before downsampling
+    # Tables whose row counts are kept in db_stats
+    COUNTED_TABLES = ('snapshots', 'player_points', 'players', 'team_history')
+
+    def __init__(self, db_path: str = None, read_only: bool = False):
         if db_path is None:
             # Use persistent disk in production, local file in development
             if os.environ.get('RENDER'):
@@ -21,19 +46,85 @@ class HistoryDatabase:
             self.db_path = db_path
             self.is_production = os.environ.get('RENDER') == 'true'
         
-        self.init_database()
+        # One shared writer connection (SQLite allows a single writer at a time)
+        # plus a pool of read-only connections for API handlers
+        self._write_conn = None
+        self._write_lock = threading.RLock()
+        self._read_pool = queue.LifoQueue(maxsize=self.READ_POOL_SIZE)
+        
+        # Read-only processes (RUN_MODE=web) leave schema and migrations to the writer
+        self.read_only = read_only
+        if not read_only:
+            self.init_database()
         
         # Log database info
-        if self.is_production:
+        if read_only:
+            print(f"Read-only database opened at: {self.db_path}")
+        elif self.is_production:
             print(f"Production database initialized at: {self.db_path}")
         else:
             print(f"Development database initialized at: {self.db_path}")
     
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """Apply the tuning pragmas to a new connection"""
+        for pragma, value in self.PRAGMAS.items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+    
+    @contextmanager
+    def _write_connection(self):
+        """Borrow the writer connection; commits on success and rolls back on error"""
+        if self.read_only:
+            raise sqlite3.OperationalError(f'{self.db_path} is opened read-only')
+        with self._write_lock:
+            if self._write_conn is None:
+                conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+                # WAL lets readers keep reading while a scrape cycle is being committed
+                conn.execute('PRAGMA journal_mode = WAL')
+                self._configure_connection(conn)
+                self._write_conn = conn
+            try:
+                yield self._write_conn
+                self._write_conn.commit()
+            except Exception:
+                self._write_conn.rollback()
+                raise
+    
+    @contextmanager
+    def _read_connection(self):
+        """Borrow a read-only connection from the pool"""
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            uri = Path(self.db_path).absolute().as_uri() + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+            self._configure_connection(conn)
+        try:
+            yield conn
+        finally:
+            try:
+                self._read_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+    
+    def close(self):
+        """Close all pooled connections"""
+        with self._write_lock:
+            if self._write_conn is not None:
+                self._write_conn.close()
+                self._write_conn = None
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
     def init_database(self):
         """Initialize the database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self._write_connection() as conn:
+            self._create_schema(conn.cursor())
+    
+    def _create_schema(self, cursor: sqlite3.Cursor):
+        """Create tables, run column migrations and add indexes"""
         # Create snapshots table for storing complete data snapshots
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS snapshots (
@@ -41,11 +132,13 @@ class HistoryDatabase:
                 timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                 data TEXT NOT NULL,
                 data_hash TEXT,
-                source TEXT DEFAULT 'unknown'
+                source TEXT DEFAULT 'unknown',
+                encoding TEXT DEFAULT 'json'
             )
         ''')
         
-        # Create player_history table for individual player tracking
+        # Legacy player_history table (one TEXT-keyed row per data point); superseded by
+        # player_points below and only kept so older databases can be migrated
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS player_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -60,6 +153,41 @@ class HistoryDatabase:
             )
         ''')
         
+        # Dimension tables mapping players, teams and skills to small integer ids
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS teams (
+                id INTEGER PRIMARY KEY,
+                code TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS skills (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS players (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                team_id INTEGER NOT NULL REFERENCES teams(id)
+            )
+        ''')
+        
+        # Create player_points table for individual player tracking: integer epoch
+        # timestamps, clustered on (player, skill, time) so a history query is one range scan
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS player_points (
+                player_id INTEGER NOT NULL,
+                skill_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                xp INTEGER NOT NULL,
+                rank INTEGER NOT NULL,
+                PRIMARY KEY (player_id, skill_id, ts)
+            ) WITHOUT ROWID
+        ''')
+        
         # Create team_history table for team aggregate tracking
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS team_history (
@@ -75,6 +203,44 @@ class HistoryDatabase:
             )
         ''')
         
+        # Rollups of player_points and team_history: one row per series and bucket
+        # holding the bucket's last sample, so long ranges can be charted from few rows
+        for suffix in self.ROLLUP_SECONDS:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS player_points_{suffix} (
+                    player_id INTEGER NOT NULL,
+                    skill_id INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    level INTEGER NOT NULL,
+                    xp INTEGER NOT NULL,
+                    rank INTEGER NOT NULL,
+                    PRIMARY KEY (player_id, skill_id, bucket)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS team_history_{suffix} (
+                    team TEXT NOT NULL,
+                    skill TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    ts INTEGER NOT NULL,
+                    avg_level REAL NOT NULL,
+                    avg_xp INTEGER NOT NULL,
+                    total_xp INTEGER NOT NULL,
+                    players_count INTEGER NOT NULL,
+                    PRIMARY KEY (team, skill, bucket)
+                ) WITHOUT ROWID
+            ''')
+        
+        # Row counts, per-source snapshot counts and the snapshot date range, updated in the
+        # same transaction as every write so reading statistics never scans the history
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS db_stats (
+                name TEXT PRIMARY KEY,
+                value
+            ) WITHOUT ROWID
+        ''')
+        
         # Migrate existing data if needed (add missing columns)
         try:
             # Check if data_hash column exists
@@ -88,6 +254,10 @@ class HistoryDatabase:
             if 'source' not in columns:
                 cursor.execute('ALTER TABLE snapshots ADD COLUMN source TEXT DEFAULT "unknown"')
                 print("Added source column to snapshots table")
+            
+            if 'encoding' not in columns:
+                cursor.execute('ALTER TABLE snapshots ADD COLUMN encoding TEXT DEFAULT "json"')
+                print("Added encoding column to snapshots table")
                 
         except sqlite3.OperationalError as e:
             print(f"Migration warning: {e}")
@@ -96,13 +266,35 @@ class HistoryDatabase:
         try:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_player_history_name_skill ON player_history(player_name, skill)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_team_history_team_skill ON team_history(team, skill)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_team_history_team_skill_time ON team_history(team, skill, timestamp)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_timestamp ON snapshots(timestamp)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_snapshots_hash ON snapshots(data_hash)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_player_points_ts ON player_points(ts)')
         except sqlite3.OperationalError as e:
             print(f"Index creation warning: {e}")
         
-        conn.commit()
-        conn.close()
+        # Move legacy player_history rows into player_points on first start with the new schema
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM player_points)')
+        if not cursor.fetchone()[0]:
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM player_history)')
+            if cursor.fetchone()[0]:
+                migrated = self._migrate_player_history(cursor)
+                print(f"Migrated {migrated} player_history rows to player_points")
+        
+        # Build the rollups once for databases created before they existed
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM player_points_daily), EXISTS (SELECT 1 FROM team_history_daily)')
+        has_player_rollups, has_team_rollups = cursor.fetchone()
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM player_points), EXISTS (SELECT 1 FROM team_history)')
+        has_player_points, has_team_history = cursor.fetchone()
+        if (has_player_points and not has_player_rollups) or (has_team_history and not has_team_rollups):
+            counts = self._rebuild_rollups(cursor)
+            print(f"Built history rollups: {counts}")
+        
+        # Count the existing rows once for databases created before db_stats existed
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM db_stats)')
+        if not cursor.fetchone()[0]:
+            self._rebuild_stats(cursor)
+            print("Built database statistics")
     
     def _calculate_data_hash(self, data: Dict) -> str:
         """Calculate a hash of the data for deduplication"""
@@ -115,18 +307,69 @@ class HistoryDatabase:
         data_str = json.dumps(relevant_data, sort_keys=True)
         return hashlib.md5(data_str.encode()).hexdigest()
     
+    def _encode_snapshot(self, data: Dict):
+        """Serialize a processed snapshot for storage, returning (payload, encoding)"""
+        text = json.dumps(data, separators=(',', ':'))
+        if self.SNAPSHOT_ENCODING == 'zlib-json':
+            return zlib.compress(text.encode('utf-8'), self.SNAPSHOT_COMPRESSION_LEVEL), 'zlib-json'
+        return text, 'json'
+    
+    def _decode_snapshot(self, payload, encoding: str) -> Dict:
+        """Decode a stored snapshot written by any supported encoding"""
+        if encoding == 'zlib-json':
+            return json.loads(zlib.decompress(payload))
+        return json.loads(payload)
+    
+    def _current_timestamp(self) -> str:
+        """UTC timestamp in the same format as SQLite's CURRENT_TIMESTAMP"""
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def save_cycle(self, raw_data: Dict, processed_data: Dict) -> int:
+        """Save the snapshot, player rows and team rows of one scrape cycle in a single
+        transaction, all stamped with the same timestamp. Returns the snapshot id."""
+        if not processed_data or not processed_data.get('teams'):
+            print("Skipping cycle save - no valid data")
+            return 0
+        
+        timestamp = self._current_timestamp()
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            snapshot_id = self._insert_snapshot(cursor, processed_data, timestamp)
+            self._insert_player_data(cursor, raw_data, timestamp)
+            self._insert_team_data(cursor, processed_data.get('teams', {}), timestamp)
+        
+        return snapshot_id
+    
     def save_snapshot(self, data: Dict) -> int:
         """Save a complete data snapshot with deduplication"""
         if not data or not data.get('teams'):
             print("Skipping snapshot save - no valid data")
             return 0
         
+        with self._write_connection() as conn:
+            return self._insert_snapshot(conn.cursor(), data, self._current_timestamp())
+    
+    def save_player_data(self, players_data: Dict):
+        """Save individual player data for historical tracking with deduplication"""
+        if not players_data:
+            return
+        
+        with self._write_connection() as conn:
+            self._insert_player_data(conn.cursor(), players_data, self._current_timestamp())
+    
+    def save_team_data(self, teams_data: Dict):
+        """Save team aggregate data for historical tracking with deduplication"""
+        if not teams_data:
+            return
+        
+        with self._write_connection() as conn:
+            self._insert_team_data(conn.cursor(), teams_data, self._current_timestamp())
+    
+    def _insert_snapshot(self, cursor: sqlite3.Cursor, data: Dict, timestamp: str) -> int:
+        """Insert a snapshot row unless it duplicates a recent one"""
         data_hash = self._calculate_data_hash(data)
         source = 'production' if self.is_production else 'development'
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Check if we already have this exact data in the last hour
         cursor.execute('''
             SELECT id FROM snapshots 
@@ -137,7 +380,6 @@ class HistoryDatabase:
         existing = cursor.fetchone()
         if existing:
             print(f"Skipping duplicate snapshot (hash: {data_hash[:8]}...)")
-            conn.close()
             return existing[0]
         
         # In development, don't save if we have recent production data
@@ -150,81 +392,140 @@ class HistoryDatabase:
             
             if recent_prod_count > 0:
                 print("Development mode: Skipping save due to recent production data")
-                conn.close()
                 return 0
         
+        payload, encoding = self._encode_snapshot(data)
         cursor.execute('''
-            INSERT INTO snapshots (data, data_hash, source) 
-            VALUES (?, ?, ?)
-        ''', (json.dumps(data), data_hash, source))
+            INSERT INTO snapshots (timestamp, data, data_hash, source, encoding) 
+            VALUES (?, ?, ?, ?, ?)
+        ''', (timestamp, payload, data_hash, source, encoding))
         
         snapshot_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
+        self._add_stats(cursor, {'snapshots': 1, f'source:{source}': 1})
+        cursor.execute('''
+            INSERT INTO db_stats (name, value) VALUES ('snapshots_earliest', ?)
+            ON CONFLICT (name) DO UPDATE SET value = MIN(value, excluded.value)
+        ''', (timestamp,))
+        cursor.execute('''
+            INSERT INTO db_stats (name, value) VALUES ('snapshots_latest', ?)
+            ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)
+        ''', (timestamp,))
+        DB_ROWS_INSERTED.inc(table='snapshots')
         print(f"Saved snapshot {snapshot_id} from {source} (hash: {data_hash[:8]}...)")
         return snapshot_id
     
-    def save_player_data(self, players_data: Dict):
-        """Save individual player data for historical tracking with deduplication"""
-        if not players_data:
-            return
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _insert_player_data(self, cursor: sqlite3.Cursor, players_data: Dict, timestamp: str) -> int:
+        """Bulk insert raw player rows; duplicates are ignored by the primary key"""
+        ts = self._to_epoch(timestamp)
         
         # In development, don't save if we have recent production data
         if not self.is_production:
             cursor.execute('''
-                SELECT COUNT(*) FROM player_history 
-                WHERE timestamp > datetime('now', '-2 hours')
-            ''')
+                SELECT COUNT(*) FROM player_points 
+                WHERE ts > ?
+            ''', (ts - 2 * 3600,))
             recent_count = cursor.fetchone()[0]
             
             if recent_count > 100:  # Arbitrary threshold
                 print("Development mode: Skipping player data save due to recent data")
-                conn.close()
-                return
-        
-        saved_count = 0
-        # Extract player data from the processed data structure
-        for skill, players in players_data.items():
-            for player in players:
-                # Determine team from player name
-                team = self._get_team_from_name(player['name'])
-                
-                try:
-                    cursor.execute('''
-                        INSERT INTO player_history 
-                        (player_name, team, skill, level, xp, rank)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        player['name'],
-                        team,
-                        skill,
-                        player['level'],
-                        player['xp'],
-                        player['rank']
-                    ))
-                    saved_count += 1
-                except sqlite3.IntegrityError:
-                    # Duplicate entry, skip
-                    pass
-        
-        conn.commit()
-        conn.close()
+                return 0
         
+        player_ids, skill_ids = self._ensure_dimensions(cursor, players_data)
+        rows = [
+            (player_ids[player['name']], skill_ids[skill], ts, player['level'], player['xp'], player['rank'])
+            for skill, players in players_data.items()
+            for player in players
+        ]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO player_points 
+            (player_id, skill_id, ts, level, xp, rank)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        
+        saved_count = max(cursor.rowcount, 0)
+        self._add_stats(cursor, {'player_points': saved_count})
+        DB_ROWS_INSERTED.inc(saved_count, table='player_points')
         if saved_count > 0:
             print(f"Saved {saved_count} new player data points")
-    
-    def save_team_data(self, teams_data: Dict):
-        """Save team aggregate data for historical tracking with deduplication"""
-        if not teams_data:
-            return
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
+        for suffix, seconds in self.ROLLUP_SECONDS.items():
+            cursor.executemany(f'''
+                INSERT INTO player_points_{suffix} (player_id, skill_id, bucket, ts, level, xp, rank)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (player_id, skill_id, bucket) DO UPDATE SET
+                    ts = excluded.ts, level = excluded.level, xp = excluded.xp, rank = excluded.rank
+                WHERE excluded.ts >= player_points_{suffix}.ts
+            ''', [(player_id, skill_id, ts - ts % seconds, ts, level, xp, rank)
+                  for player_id, skill_id, ts, level, xp, rank in rows])
+        return saved_count
+    
+    def _ensure_dimensions(self, cursor: sqlite3.Cursor, players_data: Dict):
+        """Register any new players, teams and skills; returns (player ids, skill ids) by name"""
+        names = {player['name'] for players in players_data.values() for player in players}
+        teams = {self._get_team_from_name(name) for name in names}
+        
+        cursor.executemany('INSERT OR IGNORE INTO teams (code) VALUES (?)', [(team,) for team in teams])
+        cursor.executemany('INSERT OR IGNORE INTO skills (name) VALUES (?)', [(skill,) for skill in players_data])
+        cursor.executemany('''
+            INSERT OR IGNORE INTO players (name, team_id)
+            SELECT ?, id FROM teams WHERE code = ?
+        ''', [(name, self._get_team_from_name(name)) for name in names])
+        self._add_stats(cursor, {'players': max(cursor.rowcount, 0)})
+        
+        cursor.execute('SELECT name, id FROM players')
+        player_ids = dict(cursor.fetchall())
+        cursor.execute('SELECT name, id FROM skills')
+        skill_ids = dict(cursor.fetchall())
+        return player_ids, skill_ids
+    
+    def _to_epoch(self, timestamp: str) -> int:
+        """Convert a 'YYYY-MM-DD HH:MM:SS' UTC timestamp to epoch seconds"""
+        return int(datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp())
+    
+    def _migrate_player_history(self, cursor: sqlite3.Cursor) -> int:
+        """Copy legacy player_history rows into the normalized player_points table"""
+        cursor.execute('INSERT OR IGNORE INTO teams (code) SELECT DISTINCT team FROM player_history')
+        cursor.execute('INSERT OR IGNORE INTO skills (name) SELECT DISTINCT skill FROM player_history')
+        cursor.execute('''
+            INSERT OR IGNORE INTO players (name, team_id)
+            SELECT h.player_name, t.id
+            FROM (SELECT player_name, MAX(team) AS team FROM player_history GROUP BY player_name) h
+            JOIN teams t ON t.code = h.team
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO player_points (player_id, skill_id, ts, level, xp, rank)
+            SELECT p.id, s.id, CAST(strftime('%s', h.timestamp) AS INTEGER), h.level, h.xp, h.rank
+            FROM player_history h
+            JOIN players p ON p.name = h.player_name
+            JOIN skills s ON s.name = h.skill
+        ''')
+        return max(cursor.rowcount, 0)
+    
+    def migrate_player_history(self, drop_legacy: bool = False) -> Dict:
+        """Copy any legacy player_history rows into player_points, optionally dropping the
+        legacy rows afterwards. Returns row counts for both tables."""
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            migrated = self._migrate_player_history(cursor)
+            if migrated:
+                self._rebuild_rollups(cursor)
+                self._rebuild_stats(cursor)
+            cursor.execute('SELECT COUNT(*) FROM player_history')
+            legacy_rows = cursor.fetchone()[0]
+            if drop_legacy:
+                cursor.execute('DELETE FROM player_history')
+            cursor.execute('SELECT COUNT(*) FROM player_points')
+            point_rows = cursor.fetchone()[0]
+        
+        return {
+            'migrated_rows': migrated,
+            'legacy_rows': legacy_rows,
+            'legacy_dropped': drop_legacy,
+            'player_points_rows': point_rows
+        }
+    
+    def _insert_team_data(self, cursor: sqlite3.Cursor, teams_data: Dict, timestamp: str) -> int:
+        """Bulk insert team aggregate rows; duplicates are ignored by the UNIQUE constraint"""
         # In development, don't save if we have recent production data
         if not self.is_production:
             cursor.execute('''
@@ -235,162 +536,336 @@ class HistoryDatabase:
             
             if recent_count > 50:  # Arbitrary threshold
                 print("Development mode: Skipping team data save due to recent data")
-                conn.close()
-                return
+                return 0
         
-        saved_count = 0
+        rows = []
         for team_code, team_info in teams_data.items():
             for skill, averages in team_info.get('averages', {}).items():
                 totals = team_info.get('totals', {}).get(skill, {})
-                
-                try:
-                    cursor.execute('''
-                        INSERT INTO team_history 
-                        (team, skill, avg_level, avg_xp, total_xp, players_count)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        team_code,
-                        skill,
-                        averages.get('level', 0),
-                        averages.get('xp', 0),
-                        totals.get('xp', 0),
-                        totals.get('players', 0)
-                    ))
-                    saved_count += 1
-                except sqlite3.IntegrityError:
-                    # Duplicate entry, skip
-                    pass
-        
-        conn.commit()
-        conn.close()
-        
+                rows.append((
+                    timestamp,
+                    team_code,
+                    skill,
+                    averages.get('level', 0),
+                    averages.get('xp', 0),
+                    totals.get('xp', 0),
+                    totals.get('players', 0)
+                ))
+        cursor.executemany('''
+            INSERT INTO team_history 
+            (timestamp, team, skill, avg_level, avg_xp, total_xp, players_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        
+        saved_count = max(cursor.rowcount, 0)
+        self._add_stats(cursor, {'team_history': saved_count})
+        DB_ROWS_INSERTED.inc(saved_count, table='team_history')
         if saved_count > 0:
             print(f"Saved {saved_count} new team data points")
-    
-    def get_database_stats(self) -> Dict:
-        """Get statistics about the database content"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
+        ts = self._to_epoch(timestamp)
+        for suffix, seconds in self.ROLLUP_SECONDS.items():
+            cursor.executemany(f'''
+                INSERT INTO team_history_{suffix}
+                (team, skill, bucket, ts, avg_level, avg_xp, total_xp, players_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (team, skill, bucket) DO UPDATE SET
+                    ts = excluded.ts, avg_level = excluded.avg_level, avg_xp = excluded.avg_xp,
+                    total_xp = excluded.total_xp, players_count = excluded.players_count
+                WHERE excluded.ts >= team_history_{suffix}.ts
+            ''', [(team, skill, ts - ts % seconds, ts, *values) for _, team, skill, *values in rows])
+        return saved_count
+    
+    def _rebuild_rollups(self, cursor: sqlite3.Cursor) -> Dict:
+        """Recompute every rollup table from the raw history; returns rows per table"""
+        counts = {}
+        for suffix, seconds in self.ROLLUP_SECONDS.items():
+            # SQLite takes the bare columns from the row that holds MAX(ts): the bucket's last sample
+            cursor.execute(f'DELETE FROM player_points_{suffix}')
+            cursor.execute(f'''
+                INSERT INTO player_points_{suffix} (player_id, skill_id, bucket, ts, level, xp, rank)
+                SELECT player_id, skill_id, ts - ts % {seconds}, MAX(ts), level, xp, rank
+                FROM player_points
+                GROUP BY player_id, skill_id, ts - ts % {seconds}
+            ''')
+            counts[f'player_points_{suffix}'] = max(cursor.rowcount, 0)
+            
+            cursor.execute(f'DELETE FROM team_history_{suffix}')
+            cursor.execute(f'''
+                INSERT INTO team_history_{suffix}
+                (team, skill, bucket, ts, avg_level, avg_xp, total_xp, players_count)
+                SELECT team, skill, epoch - epoch % {seconds}, MAX(epoch), avg_level, avg_xp, total_xp, players_count
+                FROM (SELECT *, CAST(strftime('%s', timestamp) AS INTEGER) AS epoch FROM team_history)
+                GROUP BY team, skill, epoch - epoch % {seconds}
+            ''')
+            counts[f'team_history_{suffix}'] = max(cursor.rowcount, 0)
+        return counts
+    
+    def rebuild_rollups(self) -> Dict:
+        """Recompute the hourly and daily history rollups from the raw rows"""
+        with self._write_connection() as conn:
+            return self._rebuild_rollups(conn.cursor())
+    
+    def _add_stats(self, cursor: sqlite3.Cursor, deltas: Dict[str, int]):
+        """Add row count changes to db_stats"""
+        cursor.executemany('''
+            INSERT INTO db_stats (name, value) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET value = value + excluded.value
+        ''', [(name, delta) for name, delta in deltas.items() if delta])
+    
+    def _count_stats(self, cursor: sqlite3.Cursor) -> Dict:
+        """Compute the db_stats entries from the tables themselves (full scans)"""
         stats = {}
-        
-        # Snapshot stats
-        cursor.execute('SELECT COUNT(*) FROM snapshots')
-        stats['total_snapshots'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM snapshots')
-        result = cursor.fetchone()
-        stats['snapshot_date_range'] = {
-            'earliest': result[0],
-            'latest': result[1]
-        }
-        
+        for table in self.COUNTED_TABLES:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            stats[table] = cursor.fetchone()[0]
         cursor.execute('SELECT source, COUNT(*) FROM snapshots GROUP BY source')
-        stats['snapshots_by_source'] = dict(cursor.fetchall())
-        
-        # Player history stats
-        cursor.execute('SELECT COUNT(*) FROM player_history')
-        stats['total_player_records'] = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT player_name) FROM player_history')
-        stats['unique_players'] = cursor.fetchone()[0]
-        
-        # Team history stats
-        cursor.execute('SELECT COUNT(*) FROM team_history')
-        stats['total_team_records'] = cursor.fetchone()[0]
-        
-        # Recent activity
-        cursor.execute('''
-            SELECT COUNT(*) FROM snapshots 
-            WHERE timestamp > datetime('now', '-24 hours')
-        ''')
-        stats['snapshots_last_24h'] = cursor.fetchone()[0]
-        
-        conn.close()
+        stats.update({f'source:{source}': count for source, count in cursor.fetchall()})
+        cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM snapshots')
+        earliest, latest = cursor.fetchone()
+        if earliest is not None:
+            stats['snapshots_earliest'] = earliest
+            stats['snapshots_latest'] = latest
+        return stats
+    
+    def _rebuild_stats(self, cursor: sqlite3.Cursor) -> Dict:
+        """Replace db_stats with freshly counted values; returns them"""
+        stats = self._count_stats(cursor)
+        cursor.execute('DELETE FROM db_stats')
+        cursor.executemany('INSERT INTO db_stats (name, value) VALUES (?, ?)', list(stats.items()))
         return stats
     
-    def get_player_history(self, player_name: str, skill: str = 'overall') -> List[Dict]:
-        """Get historical data for a specific player and skill"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def rebuild_stats(self) -> Dict:
+        """Recount db_stats from the tables, e.g. after rows were changed outside this class"""
+        with self._write_connection() as conn:
+            return self._rebuild_stats(conn.cursor())
+    
+    def verify_stats(self) -> Dict:
+        """Compare db_stats with a full recount; returns {name: (stored, actual)} for every entry that drifted"""
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, value FROM db_stats')
+            stored = dict(cursor.fetchall())
+            actual = self._count_stats(cursor)
+        
+        return {
+            name: (stored.get(name), actual.get(name))
+            for name in sorted(set(stored) | set(actual))
+            if stored.get(name) != actual.get(name)
+        }
+    
+    def get_database_stats(self) -> Dict:
+        """Get statistics about the database content from the maintained db_stats counters"""
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT name, value FROM db_stats')
+            stored = dict(cursor.fetchall())
+            
+            # Recent activity: a range scan of the timestamp index, at most a day of snapshots
+            cursor.execute('''
+                SELECT COUNT(*) FROM snapshots 
+                WHERE timestamp > datetime('now', '-24 hours')
+            ''')
+            snapshots_last_24h = cursor.fetchone()[0]
+        
+        return {
+            'total_snapshots': stored.get('snapshots', 0),
+            'snapshot_date_range': {
+                'earliest': stored.get('snapshots_earliest'),
+                'latest': stored.get('snapshots_latest')
+            },
+            'snapshots_by_source': {
+                name[len('source:'):]: count
+                for name, count in sorted(stored.items())
+                if name.startswith('source:')
+            },
+            'total_player_records': stored.get('player_points', 0),
+            'unique_players': stored.get('players', 0),
+            'total_team_records': stored.get('team_history', 0),
+            'snapshots_last_24h': snapshots_last_24h
+        }
+    
+    def _pick_resolution(self, span: int, max_points: Optional[int]) -> str:
+        """Finest table whose estimated row count over span seconds stays within the read budget"""
+        if not max_points:
+            return 'raw'
+        for resolution, seconds in (('raw', self.RAW_INTERVAL), *self.ROLLUP_SECONDS.items()):
+            if span / seconds <= max_points * self.ROLLUP_OVERSAMPLE:
+                return resolution
+        return resolution
+    
+    def _format_history(self, rows: List[Tuple], fields: Tuple[str, ...], max_points: Optional[int],
+                        y_index: int) -> List[Dict]:
+        """Downsample (epoch, timestamp text, *values) rows to max_points and turn them into dicts"""
+        if max_points and len(rows) > max_points:
+            rows = lttb(rows, max_points, y_index)
+        # The query already formatted the timestamps; only the epoch column is dropped here
+        keys = ('timestamp',) + fields
+        return [dict(zip(keys, row[1:])) for row in rows]
+    
+    def get_player_history(self, player_name: str, skill: str = 'overall', start: Optional[int] = None,
+                           end: Optional[int] = None, resolution: str = 'raw',
+                           max_points: Optional[int] = None) -> List[Dict]:
+        """Get historical data for a specific player and skill.
+        
+        start and end bound the window in epoch seconds. resolution is 'raw',
+        'hourly', 'daily' or 'auto' (the finest table that fits max_points); with
+        max_points set the points are downsampled to at most that many.
+        """
+        start = start if start is not None else 0
+        end = end if end is not None else 2 ** 62
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT (SELECT id FROM players WHERE name = ?), (SELECT id FROM skills WHERE name = ?)
+            ''', (player_name, skill))
+            player_id, skill_id = cursor.fetchone()
+            
+            if resolution == 'auto':
+                # Each bound is a single seek on the (player_id, skill_id, ts) key
+                cursor.execute('''
+                    SELECT (SELECT MIN(ts) FROM player_points WHERE player_id = ? AND skill_id = ? AND ts >= ?),
+                           (SELECT MAX(ts) FROM player_points WHERE player_id = ? AND skill_id = ? AND ts <= ?)
+                ''', (player_id, skill_id, start, player_id, skill_id, end))
+                first, last = cursor.fetchone()
+                resolution = self._pick_resolution((last or 0) - (first or 0), max_points)
+            
+            table = 'player_points' if resolution == 'raw' else f'player_points_{resolution}'
+            cursor.execute(f'''
+                SELECT ts, datetime(ts, 'unixepoch'), level, xp, rank
+                FROM {table}
+                WHERE player_id = ? AND skill_id = ? AND ts BETWEEN ? AND ?
+                ORDER BY ts ASC
+            ''', (player_id, skill_id, start, end))
+            
+            results = cursor.fetchall()
         
-        cursor.execute('''
-            SELECT timestamp, level, xp, rank
-            FROM player_history
-            WHERE player_name = ? AND skill = ?
-            ORDER BY timestamp ASC
-        ''', (player_name, skill))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'timestamp': row[0],
-                'level': row[1],
-                'xp': row[2],
-                'rank': row[3]
-            }
-            for row in results
-        ]
+        return self._format_history(results, ('level', 'xp', 'rank'), max_points, 3)
     
-    def get_team_history(self, team: str, skill: str = 'overall') -> List[Dict]:
-        """Get historical data for a specific team and skill"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_team_history(self, team: str, skill: str = 'overall', start: Optional[int] = None,
+                         end: Optional[int] = None, resolution: str = 'raw',
+                         max_points: Optional[int] = None) -> List[Dict]:
+        """Get historical data for a specific team and skill; the window and
+        resolution arguments work as in get_player_history"""
+        start = start if start is not None else 0
+        end = end if end is not None else 253402300799  # 9999-12-31 23:59:59
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            
+            if resolution == 'auto':
+                cursor.execute('''
+                    SELECT (SELECT MIN(timestamp) FROM team_history
+                            WHERE team = ? AND skill = ? AND timestamp >= datetime(?, 'unixepoch')),
+                           (SELECT MAX(timestamp) FROM team_history
+                            WHERE team = ? AND skill = ? AND timestamp <= datetime(?, 'unixepoch'))
+                ''', (team, skill, start, team, skill, end))
+                first, last = (self._to_epoch(value) if value else 0 for value in cursor.fetchone())
+                resolution = self._pick_resolution(last - first, max_points)
+            
+            if resolution == 'raw':
+                cursor.execute('''
+                    SELECT CAST(strftime('%s', timestamp) AS INTEGER), timestamp, avg_level, avg_xp, total_xp, players_count
+                    FROM team_history
+                    WHERE team = ? AND skill = ?
+                      AND timestamp BETWEEN datetime(?, 'unixepoch') AND datetime(?, 'unixepoch')
+                    ORDER BY timestamp ASC
+                ''', (team, skill, start, end))
+            else:
+                cursor.execute(f'''
+                    SELECT ts, datetime(ts, 'unixepoch'), avg_level, avg_xp, total_xp, players_count
+                    FROM team_history_{resolution}
+                    WHERE team = ? AND skill = ? AND ts BETWEEN ? AND ?
+                    ORDER BY ts ASC
+                ''', (team, skill, start, end))
+            
+            results = cursor.fetchall()
         
-        cursor.execute('''
-            SELECT timestamp, avg_level, avg_xp, total_xp, players_count
-            FROM team_history
-            WHERE team = ? AND skill = ?
-            ORDER BY timestamp ASC
-        ''', (team, skill))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        return [
-            {
-                'timestamp': row[0],
-                'avg_level': row[1],
-                'avg_xp': row[2],
-                'total_xp': row[3],
-                'players_count': row[4]
-            }
-            for row in results
-        ]
+        return self._format_history(results, ('avg_level', 'avg_xp', 'total_xp', 'players_count'), max_points, 4)
     
     def get_latest_snapshot(self) -> Dict:
         """Get the most recent data snapshot"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT data FROM snapshots
-            ORDER BY timestamp DESC
-            LIMIT 1
-        ''')
-        
-        result = cursor.fetchone()
-        conn.close()
+        entry = self.get_latest_snapshot_entry()
+        return entry[1] if entry else {}
+    
+    def get_latest_snapshot_entry(self) -> Optional[Tuple[str, Dict]]:
+        """Get the (UTC timestamp, data) of the most recent snapshot"""
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT timestamp, data, encoding FROM snapshots
+                ORDER BY timestamp DESC
+                LIMIT 1
+            ''')
+            
+            result = cursor.fetchone()
         
         if result:
-            return json.loads(result[0])
-        return {}
+            return result[0], self._decode_snapshot(result[1], result[2])
+        return None
+    
+    def compress_snapshots(self, batch_size: int = 50) -> Dict:
+        """Re-encode stored plain JSON snapshots with the current snapshot encoding and
+        reclaim the freed pages. Returns row and file size figures before and after."""
+        report = {
+            'file_bytes_before': os.path.getsize(self.db_path),
+            'rows_rewritten': 0,
+            'data_bytes_before': 0,
+            'data_bytes_after': 0
+        }
+        
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM snapshots WHERE encoding IS NULL OR encoding != ?', (self.SNAPSHOT_ENCODING,))
+            ids = [row[0] for row in cursor.fetchall()]
+        
+        # Rewrite in small transactions so the scheduler is never blocked for long
+        for start in range(0, len(ids), batch_size):
+            with self._write_connection() as conn:
+                cursor = conn.cursor()
+                for snapshot_id in ids[start:start + batch_size]:
+                    cursor.execute('SELECT data, encoding FROM snapshots WHERE id = ?', (snapshot_id,))
+                    payload, encoding = cursor.fetchone()
+                    new_payload, new_encoding = self._encode_snapshot(self._decode_snapshot(payload, encoding))
+                    cursor.execute(
+                        'UPDATE snapshots SET data = ?, encoding = ? WHERE id = ?',
+                        (new_payload, new_encoding, snapshot_id)
+                    )
+                    report['rows_rewritten'] += 1
+                    report['data_bytes_before'] += len(payload.encode('utf-8') if isinstance(payload, str) else payload)
+                    report['data_bytes_after'] += len(new_payload)
+        
+        self.vacuum()
+        report['file_bytes_after'] = os.path.getsize(self.db_path)
+        return report
+    
+    def vacuum(self):
+        """Rebuild the database file to reclaim space freed by deletes and rewrites"""
+        # VACUUM cannot run inside a transaction
+        with self._write_connection() as conn:
+            conn.commit()
+            conn.isolation_level = None
+            try:
+                conn.execute('VACUUM')
+                # Fold the WAL back into the main file so the new size is visible on disk
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            finally:
+                conn.isolation_level = ''
     
     def get_all_players(self) -> List[str]:
         """Get list of all unique player names"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT DISTINCT player_name
-            FROM player_history
-            ORDER BY player_name
-        ''')
-        
-        results = cursor.fetchall()
-        conn.close()
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT name
+                FROM players
+                ORDER BY name
+            ''')
+            
+            results = cursor.fetchall()
         
         return [row[0] for row in results]
     
@@ -412,23 +887,56 @@ class HistoryDatabase:
     
     def cleanup_old_data(self, days_to_keep: int = 30):
         """Remove data older than specified days"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM snapshots 
-            WHERE timestamp < datetime('now', '-{} days')
-        '''.format(days_to_keep))
-        
-        cursor.execute('''
-            DELETE FROM player_history 
-            WHERE timestamp < datetime('now', '-{} days')
-        '''.format(days_to_keep))
-        
-        cursor.execute('''
-            DELETE FROM team_history 
-            WHERE timestamp < datetime('now', '-{} days')
-        '''.format(days_to_keep))
-        
-        conn.commit()
-        conn.close() 
\ No newline at end of file
+        with self._write_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT source, COUNT(*) FROM snapshots 
+                WHERE timestamp < datetime('now', '-{} days')
+                GROUP BY source
+            '''.format(days_to_keep))
+            removed = {f'source:{source}': -count for source, count in cursor.fetchall()}
+            
+            cursor.execute('''
+                DELETE FROM snapshots 
+                WHERE timestamp < datetime('now', '-{} days')
+            '''.format(days_to_keep))
+            removed['snapshots'] = -max(cursor.rowcount, 0)
+            
+            cursor.execute('''
+                DELETE FROM player_points 
+                WHERE ts < CAST(strftime('%s', 'now', '-{} days') AS INTEGER)
+            '''.format(days_to_keep))
+            removed['player_points'] = -max(cursor.rowcount, 0)
+            
+            cursor.execute('''
+                DELETE FROM team_history 
+                WHERE timestamp < datetime('now', '-{} days')
+            '''.format(days_to_keep))
+            removed['team_history'] = -max(cursor.rowcount, 0)
+            
+            self._add_stats(cursor, removed)
+            cursor.execute("DELETE FROM db_stats WHERE name LIKE 'source:%' AND value = 0")
+            if removed['snapshots']:
+                # The oldest snapshots are gone; the new earliest is one index lookup away
+                cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM snapshots')
+                earliest, latest = cursor.fetchone()
+                cursor.execute("DELETE FROM db_stats WHERE name IN ('snapshots_earliest', 'snapshots_latest')")
+                if earliest is not None:
+                    cursor.executemany('INSERT INTO db_stats (name, value) VALUES (?, ?)',
+                                       [('snapshots_earliest', earliest), ('snapshots_latest', latest)])
+            
+            for suffix in self.ROLLUP_SECONDS:
+                for table in (f'player_points_{suffix}', f'team_history_{suffix}'):
+                    cursor.execute('''
+                        DELETE FROM {} 
+                        WHERE ts < CAST(strftime('%s', 'now', '-{} days') AS INTEGER)
+                    '''.format(table, days_to_keep))
+            
+            # Players whose every point was removed drop out of the players count (and
+            # get_all_players) as before; a later scrape registers them again
+            cursor.execute('''
+                DELETE FROM players
+                WHERE NOT EXISTS (SELECT 1 FROM player_points WHERE player_id = players.id)
+            ''')
+            self._add_stats(cursor, {'players': -max(cursor.rowcount, 0)})
@@ -0,0 +1,39 @@
+from typing import List, Sequence
+
+def lttb(points: Sequence[Sequence], threshold: int, y: int = 1) -> List:
+    """Largest-Triangle-Three-Buckets downsampling of time-ordered points.
+
+    Each point is a sequence whose first item is the x value (epoch seconds)
+    and whose item at index y is the value to preserve. Keeps the first and
+    last point and, from every bucket in between, the point forming the largest
+    triangle with the previously kept point and the next bucket's average, so
+    spikes and turns survive while flat stretches are thinned out.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (count - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        next_points = points[next_start:next_end]
+        avg_x = sum(point[0] for point in next_points) / len(next_points)
+        avg_y = sum(point[y] for point in next_points) / len(next_points)
+
+        prev_x, prev_y = points[previous][0], points[previous][y]
+        best_area = -1
+        for index in range(int(bucket * every) + 1, next_start):
+            point = points[index]
+            area = abs((prev_x - avg_x) * (point[y] - prev_y) - (prev_x - point[0]) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best = index
+        sampled.append(points[best])
+        previous = best
+
+    sampled.append(points[-1])
+    return sampled
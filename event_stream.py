@@ -0,0 +1,137 @@
+import json
+import queue
+import threading
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    import asyncio
+
+# Ask clients to wait a few seconds before reconnecting after a drop
+RETRY_MESSAGE = 'retry: 5000\n\n'
+# Comment line that keeps idle connections (and proxies) from timing out
+KEEP_ALIVE_MESSAGE = ': keep-alive\n\n'
+
+class EventBroker:
+    """Fan-out of data version events to Server-Sent Events subscribers.
+
+    Every subscriber gets its own small queue. Only the newest events matter to
+    clients, so a slow subscriber drops its oldest queued event instead of letting
+    memory grow, and the number of subscribers is capped.
+    """
+
+    def __init__(self, max_subscribers: int = 500, queue_size: int = 4):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.last_event = None
+        self.lock = threading.Lock()
+
+    def subscribe(self) -> Optional['ThreadSubscriber']:
+        """Register a subscriber for a request thread, or return None when the broker is full"""
+        return self._register(ThreadSubscriber(self.queue_size))
+
+    def subscribe_async(self, loop: 'asyncio.AbstractEventLoop') -> Optional['AsyncSubscriber']:
+        """Register a subscriber for a coroutine on loop, or return None when the broker is full"""
+        return self._register(AsyncSubscriber(loop, self.queue_size))
+
+    def _register(self, subscriber):
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            self.subscribers.add(subscriber)
+            # Bring the new client up to date with the current version straight away
+            if self.last_event is not None:
+                subscriber.deliver(self.last_event)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Dict, event_id: str = None):
+        """Send an event to every subscriber"""
+        message = format_event(event, data, event_id)
+        with self.lock:
+            self.last_event = message
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.deliver(message)
+
+    def subscriber_count(self) -> int:
+        with self.lock:
+            return len(self.subscribers)
+
+class ThreadSubscriber:
+    """Subscriber queue read by a blocking request thread"""
+
+    def __init__(self, queue_size: int):
+        self.queue = queue.Queue(maxsize=queue_size)
+
+    def deliver(self, message: str):
+        _put_latest(self.queue, message, queue.Full, queue.Empty)
+
+    def get(self, timeout: float) -> str:
+        """Next message, raising queue.Empty after timeout seconds"""
+        return self.queue.get(timeout=timeout)
+
+class AsyncSubscriber:
+    """Subscriber queue read by a coroutine; may be fed from any thread"""
+
+    def __init__(self, loop: 'asyncio.AbstractEventLoop', queue_size: int):
+        # Imported here so the threaded server never loads asyncio
+        import asyncio
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.queue_errors = (asyncio.QueueFull, asyncio.QueueEmpty)
+
+    def deliver(self, message: str):
+        # asyncio queues are not thread-safe: hand the message to the loop's thread
+        self.loop.call_soon_threadsafe(_put_latest, self.queue, message, *self.queue_errors)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+def _put_latest(subscriber_queue, message: str, full_error, empty_error):
+    """Queue a message, discarding the oldest queued one if the queue is full"""
+    while True:
+        try:
+            subscriber_queue.put_nowait(message)
+            return
+        except full_error:
+            try:
+                subscriber_queue.get_nowait()
+            except empty_error:
+                pass
+
+def format_event(event: str, data: Dict, event_id: str = None) -> str:
+    """Encode one event in the text/event-stream wire format"""
+    lines = []
+    if event_id:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+def stream_events(broker: EventBroker, subscriber: ThreadSubscriber, heartbeat: float) -> Iterator[str]:
+    """Yield queued events for one client, with periodic comments to keep the connection open"""
+    try:
+        yield RETRY_MESSAGE
+        while True:
+            try:
+                yield subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield KEEP_ALIVE_MESSAGE
+    finally:
+        broker.unsubscribe(subscriber)
+
+def version_event(version: str, last_update: Optional[str], data: Dict) -> Dict:
+    """Compact 'version changed' payload: the new version plus the current team standings"""
+    standings = data.get('overall_stats', {}).get('team_standings', [])
+    return {
+        'version': version,
+        'last_update': last_update,
+        'team_standings': [
+            [team['team'], team['rank'], team['total_level'], team['total_xp']]
+            for team in standings
+        ]
+    }
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the tournament hiscores host, for measuring the scraper offline.
+
+Serves /m=hiscore_oldschool_tournament/overall?table=N&page=P and
+/hiscorepersonal?user1=NAME in the markup of the recorded pages in fixtures/,
+for the recorded roster or a synthetic one of any size, with configurable
+latency, jitter and error rate.
+
+    python fake_hiscores.py --port 8700 --latency 0.15 --error-rate 0.02
+    HISCORES_BASE_URL=http://127.0.0.1:8700/m=hiscore_oldschool_tournament python worker.py
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from html_parsers import get_parser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PATH_PREFIX = '/m=hiscore_oldschool_tournament'
+PAGE_SIZE = 25
+TEAMS = ['BB', 'DN', 'TT', 'SMO', 'OW', 'SNA']
+SKILLS = [
+    'overall', 'attack', 'defence', 'strength', 'hitpoints', 'ranged',
+    'prayer', 'magic', 'cooking', 'woodcutting', 'fletching', 'fishing',
+    'firemaking', 'crafting', 'smithing', 'mining', 'herblore', 'agility',
+    'thieving', 'slayer', 'farming', 'runecraft', 'hunter', 'construction'
+]
+
+TABLE_ROW = '''<tr class="personal-hiscores__row">
+<td class="right">
+{rank}
+</td>
+<td class="left"><a href="hiscorepersonal?user1={link}">{name}</a>
+</td>
+<td class="right">
+{level:,}
+</td>
+<td class="right">
+{xp:,}
+</td>
+</tr>
+'''
+
+PERSONAL_ROW = '''<tr>
+<td align="left"><a href="overall?table={table}&amp;user={link}">
+{skill}
+</a></td>
+<td align="right">{rank}</td>
+<td align="right">{level:,}</td>
+<td align="right">{xp:,}</td>
+</tr>
+'''
+
+def _xp_table() -> List[int]:
+    """Minimum XP of each level 1-99"""
+    points, table = 0, [0]
+    for level in range(1, 99):
+        points += int(level + 300 * 2 ** (level / 7))
+        table.append(points // 4)
+    return table
+
+XP_TABLE = _xp_table()
+
+def level_for(xp: int) -> int:
+    level = 1
+    while level < 99 and XP_TABLE[level] <= xp:
+        level += 1
+    return level
+
+def _read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def recorded_roster() -> List[str]:
+    """Player names on the recorded overall pages, in their display form"""
+    parser = get_parser('soup')
+    names = []
+    for name in ('overall_page1.html', 'overall_page2.html'):
+        for cells in parser.iter_rows(_read_fixture(name).encode('utf-8')):
+            if len(cells) >= 2 and cells[0].strip().isdigit():
+                names.append(cells[1].strip())
+    return names
+
+class FakeHiscores:
+    """Hiscore tables for a roster whose XP grows each time advance() is called"""
+
+    def __init__(self, players: Optional[int] = None, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, etags: bool = False, seed: int = 1):
+        if players is None:
+            self.names = recorded_roster()
+        else:
+            self.names = [f'{TEAMS[i % len(TEAMS)]}\xa0Player{i}' for i in range(players)]
+        self.display_names = {' '.join(name.replace('\xa0', ' ').split()): name for name in self.names}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.etags = etags
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+        # Page chrome from the recorded fixtures
+        table_page = _read_fixture('overall_page1.html')
+        self.table_head = table_page[:table_page.index('<tbody>') + len('<tbody>\n')]
+        self.table_tail = _read_fixture('overall_page2.html')
+        self.table_tail = self.table_tail[self.table_tail.index('</tbody>'):]
+        personal_page = _read_fixture('hiscorepersonal.html')
+        self.personal_head = personal_page[:personal_page.index('<h2>')]
+        self.personal_tail = personal_page[personal_page.index('</table>'):]
+
+        # Referees and other non-team accounts sit at 0 XP, as on the real tables
+        self.xp = {
+            name: {skill: 0 if not name.startswith(tuple(TEAMS)) else self.rng.randrange(0, 2_000_000)
+                   for skill in SKILLS[1:]}
+            for name in self.names
+        }
+        self.advance()
+
+    def advance(self):
+        """Move to a new hiscores version: every team player gains some XP"""
+        with self.lock:
+            for name, skills in self.xp.items():
+                if not name.startswith(tuple(TEAMS)):
+                    continue
+                for skill in skills:
+                    skills[skill] += self.rng.randrange(0, 50_000)
+            self.pages = {}
+            self.standings = self._standings()
+
+    def _standings(self) -> Dict[str, List[Tuple[str, int, int]]]:
+        """(name, level, xp) rows of every skill in rank order"""
+        standings = {}
+        for skill in SKILLS[1:]:
+            rows = [(name, level_for(skills[skill]), skills[skill]) for name, skills in self.xp.items()]
+            standings[skill] = sorted(rows, key=lambda row: -row[2])
+        overall = [
+            (name, sum(level_for(xp) for xp in skills.values()), sum(skills.values()))
+            for name, skills in self.xp.items()
+        ]
+        standings['overall'] = sorted(overall, key=lambda row: (-row[1], -row[2]))
+        return standings
+
+    def table_page(self, table: int, page: int) -> bytes:
+        key = ('table', table, page)
+        with self.lock:
+            if key not in self.pages:
+                rows = self.standings[SKILLS[table]]
+                start = (page - 1) * PAGE_SIZE
+                body = ''.join(
+                    TABLE_ROW.format(rank=start + i + 1, link=_link(name), name=name, level=level, xp=xp)
+                    for i, (name, level, xp) in enumerate(rows[start:start + PAGE_SIZE])
+                )
+                tail = self.table_tail.replace('table=0&amp;', f'table={table}&amp;')
+                self.pages[key] = (self.table_head + body + tail).encode('utf-8')
+            return self.pages[key]
+
+    def personal_page(self, name: str) -> Optional[bytes]:
+        # Like the real site, match names regardless of which kind of space they use
+        name = self.display_names.get(' '.join(name.replace('\xa0', ' ').split()))
+        with self.lock:
+            if name is None:
+                return None
+            body = [f'<h2>Personal scores for {name.replace(chr(0xa0), "&nbsp;")}</h2>\n<table>\n',
+                    '<tr><td>Skill</td><td>Rank</td><td>Level</td><td>XP</td></tr>\n']
+            for table, skill in enumerate(SKILLS):
+                rows = self.standings[skill]
+                rank, (_, level, xp) = next((i + 1, row) for i, row in enumerate(rows) if row[0] == name)
+                body.append(PERSONAL_ROW.format(table=table, link=_link(name), skill=skill.capitalize(),
+                                                rank=rank, level=level, xp=xp))
+            return (self.personal_head + ''.join(body) + self.personal_tail).encode('utf-8')
+
+    def delay(self):
+        """Sleep for one request's simulated latency; returns True if this request should fail"""
+        with self.lock:
+            self.requests += 1
+            wait = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if wait > 0:
+            time.sleep(wait)
+        return failed
+
+    def serve(self, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+        """Start serving in a daemon thread; the base URL is self.base_url"""
+        server = ThreadingHTTPServer((host, port), _handler_for(self))
+        server.daemon_threads = True
+        self.base_url = f'http://{host}:{server.server_address[1]}{PATH_PREFIX}'
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def _link(name: str) -> str:
+    # The real site links names in Latin-1 percent encoding (%A0 for the space)
+    return urllib.parse.quote(name, encoding='latin-1')
+
+def _handler_for(hiscores: FakeHiscores):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive, like the real host
+
+        def do_GET(self):
+            if hiscores.delay():
+                return self.respond(503, b'Service Unavailable')
+            path, _, query = self.path.partition('?')
+            params = urllib.parse.parse_qs(query)
+            if path == f'{PATH_PREFIX}/overall':
+                table = int(params.get('table', ['0'])[0])
+                page = int(params.get('page', ['1'])[0])
+                if not 0 <= table < len(SKILLS) or page < 1:
+                    return self.respond(404, b'Not Found')
+                return self.respond(200, hiscores.table_page(table, page))
+            if path == f'{PATH_PREFIX}/hiscorepersonal':
+                name = urllib.parse.unquote(query.partition('user1=')[2].split('&')[0], encoding='latin-1')
+                body = hiscores.personal_page(name)
+                return self.respond(200 if body else 404, body or b'Not Found')
+            self.respond(404, b'Not Found')
+
+        def respond(self, status: int, body: bytes):
+            etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if hiscores.etags and status == 200 else None
+            if etag and self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if etag:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--players', type=int, help='synthetic roster size (default: the recorded roster)')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- seconds on top of the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--etags', action='store_true', help='send ETags and answer If-None-Match with 304')
+    parser.add_argument('--advance-every', type=float, default=900, help='seconds between XP updates')
+    args = parser.parse_args()
+
+    hiscores = FakeHiscores(args.players, args.latency, args.jitter, args.error_rate, args.etags)
+    hiscores.serve(args.host, args.port)
+    print(f"🎭 Fake hiscores for {len(hiscores.names)} players at {hiscores.base_url}")
+    try:
+        while True:
+            time.sleep(args.advance_every)
+            hiscores.advance()
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped after {hiscores.requests} requests ({hiscores.errors} failed)")
+
+if __name__ == "__main__":
+    main()
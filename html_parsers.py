@@ -0,0 +1,62 @@
+from typing import List
+
+try:
+    import lxml.html
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+class SoupParser:
+    """Hiscore table row extraction using BeautifulSoup's pure-Python html.parser"""
+    name = 'soup'
+
+    def iter_rows(self, content: bytes) -> List[List[str]]:
+        """Return the stripped cell texts of every table row that contains <td> cells"""
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(content, 'html.parser')
+        rows = []
+        for row in soup.find_all('tr'):
+            cells = row.find_all('td')
+            if not cells:
+                continue
+            texts = []
+            for cell in cells:
+                # Prefer the link text (player names and skill names are links)
+                link = cell.find('a')
+                texts.append((link or cell).get_text(strip=True))
+            rows.append(texts)
+        return rows
+
+class LxmlParser:
+    """Hiscore table row extraction using the C-backed lxml HTML parser"""
+    name = 'lxml'
+
+    def iter_rows(self, content: bytes) -> List[List[str]]:
+        """Return the stripped cell texts of every table row that contains <td> cells"""
+        root = lxml.html.fromstring(content)
+        rows = []
+        for row in root.iter('tr'):
+            texts = []
+            for cell in row.iter('td'):
+                link = cell.find('.//a')
+                texts.append((cell if link is None else link).text_content().strip())
+            if texts:
+                rows.append(texts)
+        return rows
+
+PARSERS = {
+    SoupParser.name: SoupParser,
+    LxmlParser.name: LxmlParser
+}
+
+def get_parser(name: str = None):
+    """Get a parser backend by name, falling back to BeautifulSoup if lxml is unavailable"""
+    name = (name or LxmlParser.name).lower()
+    if name not in PARSERS:
+        print(f"Unknown HTML parser '{name}', using '{SoupParser.name}'")
+        name = SoupParser.name
+    if name == LxmlParser.name and not LXML_AVAILABLE:
+        print("lxml is not installed, falling back to BeautifulSoup html.parser")
+        name = SoupParser.name
+    return PARSERS[name]()
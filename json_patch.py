@@ -0,0 +1,70 @@
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+def _escape(token) -> str:
+    """Escape one JSON Pointer reference token (RFC 6901)"""
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+def make_patch(old: Any, new: Any) -> List[Dict]:
+    """Compute an RFC 6902 patch (add/remove/replace ops) turning old into new.
+
+    Objects are diffed key by key and equal-length arrays element by element;
+    arrays that grow or shrink are replaced as a whole, which keeps the patch
+    simple to apply and is rare between consecutive data versions.
+    """
+    ops = []
+    _diff(old, new, '', ops)
+    return ops
+
+def _diff(old: Any, new: Any, path: str, ops: List[Dict]):
+    # Unchanged subtrees are often shared between versions, so identity is the fast path
+    if old is new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in old.items():
+            if key not in new:
+                ops.append({'op': 'remove', 'path': f'{path}/{_escape(key)}'})
+            else:
+                _diff(value, new[key], f'{path}/{_escape(key)}', ops)
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': f'{path}/{_escape(key)}', 'value': value})
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            _diff(old_item, new_item, f'{path}/{index}', ops)
+    elif type(old) is not type(new) or old != new:
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+
+class PatchLog:
+    """Bounded ring of recent data versions and the patches between them.
+
+    Each refresh records the previous version's document and the patch from
+    it to the new one; patches from any older version still in the ring to
+    the latest one are the concatenation of the steps in between.
+    """
+
+    def __init__(self, size: int = 8):
+        self.entries = deque(maxlen=size)  # (base version, base document, patch to the next version)
+
+    def record(self, base_version: str, base_document: Dict, ops: List[Dict]):
+        self.entries.append((base_version, base_document, ops))
+
+    def document(self, version: str) -> Optional[Dict]:
+        """The document of a version still in the ring, if any"""
+        for base_version, base_document, _ in list(self.entries):
+            if base_version == version:
+                return base_document
+        return None
+
+    def documents(self) -> Dict[str, Dict]:
+        """Map every base version in the ring to its document"""
+        return {base_version: base_document for base_version, base_document, _ in list(self.entries)}
+
+    def patches_to_latest(self) -> Dict[str, List[Dict]]:
+        """Map every base version in the ring to the patch bringing it up to date, newest first"""
+        patches = {}
+        combined = []
+        for base_version, _, ops in reversed(self.entries):
+            combined = ops + combined
+            patches[base_version] = combined
+        return patches
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Load test a local instance: requests/sec and p99 latency over keep-alive
+connections, optionally while many idle /api/stream subscribers stay open.
+
+    python loadtest.py http://localhost:8080 --connections 50 --idle 1000
+    python loadtest.py --compare      # start run.py in wsgi then asgi mode and compare
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+async def open_connection(host: str, port: int):
+    return await asyncio.open_connection(host, port, limit=2 ** 24)
+
+async def fetch(reader, writer, host: str, path: str):
+    """Send one keep-alive GET and read the whole response, returning the status"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept-Encoding: gzip\r\n\r\n'.encode('latin1'))
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    length = None
+    chunked = False
+    close = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        name = name.strip().lower()
+        value = value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        close = True
+    return int(status_line.split()[1]), close
+
+async def client(url, path: str, deadline: float, latencies: list, errors: list):
+    parts = urlsplit(url)
+    connection = None
+    while time.perf_counter() < deadline:
+        try:
+            if connection is None:
+                connection = await open_connection(parts.hostname, parts.port or 80)
+            start = time.perf_counter()
+            status, close = await fetch(*connection, parts.netloc, path)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(status)
+            if close:
+                connection[1].close()
+                connection = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if connection:
+                connection[1].close()
+            connection = None
+            await asyncio.sleep(0.05)
+    if connection:
+        connection[1].close()
+
+async def idle_subscriber(url, opened: list, stop: asyncio.Event):
+    """Hold one /api/stream connection open without reading from it"""
+    parts = urlsplit(url)
+    try:
+        reader, writer = await open_connection(parts.hostname, parts.port or 80)
+        writer.write(f'GET /api/stream HTTP/1.1\r\nHost: {parts.netloc}\r\n\r\n'.encode('latin1'))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), 30)
+        if b' 200 ' in status_line:
+            opened.append(1)
+        await stop.wait()
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        pass
+
+async def run_load(url: str, path: str, connections: int, duration: float, idle: int):
+    """Return (requests per second, p99 latency ms, error count, idle streams opened)"""
+    stop = asyncio.Event()
+    opened = []
+    holders = [asyncio.ensure_future(idle_subscriber(url, opened, stop)) for _ in range(idle)]
+    if idle:
+        await asyncio.sleep(min(5, 1 + idle / 500))
+
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(client(url, path, deadline, latencies, errors) for _ in range(connections)))
+
+    stop.set()
+    await asyncio.gather(*holders)
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    return len(latencies) / duration, p99, len(errors), len(opened)
+
+def report_header():
+    print(f"{'server':<8}{'path':<22}{'idle streams':>14}{'req/s':>10}{'p99 ms':>10}{'errors':>8}")
+    print("-" * 72)
+
+def report(server: str, path: str, idle: int, opened: int, result):
+    rate, p99, errors, _ = result
+    print(f"{server:<8}{path:<22}{f'{opened}/{idle}':>14}{rate:>10,.0f}{p99:>10.1f}{errors:>8}")
+
+def wait_until_ready(url: str, process, timeout: float = 60):
+    import requests
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            requests.get(f'{url}/api/teams', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.25)
+    raise RuntimeError('server did not start')
+
+def compare(args):
+    """Start run.py once per server mode against the existing data and load test each"""
+    port = args.port
+    url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1', FLASK_ENV='production',
+               RUN_MODE='web', STREAM_MAX_SUBSCRIBERS=str(max(args.idle, 1) * 2))
+    report_header()
+    for mode in ('wsgi', 'asgi'):
+        process = subprocess.Popen([sys.executable, 'run.py'], env=dict(env, SERVER_MODE=mode),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(url, process)
+            for idle in sorted({0, args.idle}):
+                for path in args.paths:
+                    result = asyncio.run(run_load(url, path, args.connections, args.duration, idle))
+                    report(mode, path, idle, result[3], result)
+        finally:
+            process.terminate()
+            process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('url', nargs='?', default='http://127.0.0.1:8080', help='running instance to test')
+    parser.add_argument('--path', dest='paths', action='append', help='path to request (repeatable)')
+    parser.add_argument('--connections', type=int, default=32, help='concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--idle', type=int, default=0, help='idle /api/stream connections held open meanwhile')
+    parser.add_argument('--compare', action='store_true', help='start run.py in wsgi then asgi mode and compare')
+    parser.add_argument('--port', type=int, default=8765, help='port for --compare servers')
+    args = parser.parse_args()
+    args.paths = args.paths or ['/api/data', '/api/teams']
+
+    if args.compare:
+        compare(args)
+        return
+    report_header()
+    for path in args.paths:
+        result = asyncio.run(run_load(args.url, path, args.connections, args.duration, args.idle))
+        report('-', path, args.idle, result[3], result)
+
+if __name__ == "__main__":
+    main()
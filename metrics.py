@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Tuple
+
+# Upper bounds in seconds, from a fast API response to a slow scrape cycle
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: 'Metric'):
+        self.metrics.append(metric)
+
+    def on_collect(self, collector: Callable[[], None]):
+        """Call collector before every render, to refresh gauges computed on demand"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+        # Metrics without samples are left out, so the output of several processes
+        # defining the same metrics can be concatenated without duplicates
+        return ''.join(metric.render() for metric in self.metrics)
+
+REGISTRY = Registry()
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _samples(self) -> Iterator[Tuple[str, Tuple[str, ...], Tuple[Tuple[str, str], ...], float]]:
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield '', key, (), value
+
+    def render(self) -> str:
+        lines = [
+            f'{self.name}{suffix}{_format_labels(tuple(zip(self.labels, key)) + extra)} {_format_value(value)}'
+            for suffix, key, extra, value in self._samples()
+        ]
+        if not lines:
+            return ''
+        return f'# HELP {self.name} {self.help_text}\n# TYPE {self.name} {self.kind}\n' + '\n'.join(lines) + '\n'
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, help_text, labels, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            # Per-bucket counts (cumulated when rendered), then the sum of all observations
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the run time of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self.lock:
+            values = {key: list(state) for key, state in self.values.items()}
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state):
+                cumulative += count
+                yield '_bucket', key, (('le', _format_value(bound)),), cumulative
+            yield '_sum', key, (), state[-1]
+            yield '_count', key, (), cumulative
+
+def _format_labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ''
+    escaped = (
+        f'{name}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def write_metrics_file(path: str, registry: Registry = REGISTRY):
+    """Publish this process's metrics for another process's /metrics to include"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+def read_metrics_file(path: str) -> str:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+# Scraper
+SCRAPE_PAGES = Counter('deadman_scrape_pages_total', 'Hiscore pages requested, by page kind and outcome',
+                       ('kind', 'outcome'))
+SCRAPE_RETRIES = Counter('deadman_scrape_retries_total', 'Hiscore page requests retried after an error', ('kind',))
+SCRAPE_BYTES = Counter('deadman_scrape_bytes_total', 'Hiscore page bytes downloaded', ('kind',))
+SCRAPE_ROWS = Counter('deadman_scrape_rows_parsed_total', 'Player rows parsed from hiscore pages', ('kind',))
+SCRAPE_FETCH_SECONDS = Histogram('deadman_scrape_fetch_seconds', 'Time to download one hiscore page', ('kind',))
+SCRAPE_PARSE_SECONDS = Histogram('deadman_scrape_parse_seconds', 'Time to parse one hiscore page', ('kind',))
+
+# Update pipeline
+PIPELINE_PHASE_SECONDS = Histogram('deadman_pipeline_phase_seconds',
+                                   'Time spent in each phase of an update cycle (publish is payload serialization)',
+                                   ('phase',))
+PIPELINE_CYCLES = Counter('deadman_pipeline_cycles_total', 'Update cycles, by outcome', ('outcome',))
+PIPELINE_LAST_SUCCESS = Gauge('deadman_pipeline_last_success_timestamp_seconds',
+                              'Unix time of the last update cycle that produced new data')
+
+# Database
+DB_ROWS_INSERTED = Counter('deadman_db_rows_inserted_total', 'Rows written by saved update cycles', ('table',))
+DB_ROWS = Gauge('deadman_db_rows', 'Rows stored, by table', ('table',))
+DB_PLAYERS = Gauge('deadman_db_players', 'Distinct players with stored history')
+DB_SNAPSHOTS_24H = Gauge('deadman_db_snapshots_last_24h', 'Snapshots saved in the last 24 hours')
+DB_SNAPSHOT_RANGE = Gauge('deadman_db_snapshot_timestamp_seconds', 'Unix time of the oldest and newest snapshot',
+                          ('bound',))
+
+# Web
+HTTP_REQUEST_SECONDS = Histogram('deadman_http_request_duration_seconds', 'Time to produce an HTTP response',
+                                 ('method', 'route', 'status'))
+STREAM_SUBSCRIBERS = Gauge('deadman_stream_subscribers', 'Connected /api/stream clients')
+DATA_AGE_SECONDS = Gauge('deadman_data_age_seconds', 'Seconds since the served data version was produced')
+STARTUP_PHASE_SECONDS = Gauge('deadman_startup_phase_seconds', 'Time each startup phase of this process took',
+                              ('phase',))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Database maintenance and migration commands
+"""
+
+import argparse
+import os
+import sys
+from database import HistoryDatabase
+
+def format_bytes(size: int) -> str:
+    """Human readable byte count"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+def compress_snapshots(db: HistoryDatabase, args):
+    """Rewrite plain JSON snapshots in the compressed encoding"""
+    print(f"🗜️  Compressing snapshots to '{db.SNAPSHOT_ENCODING}'...")
+    report = db.compress_snapshots()
+
+    print(f"📄 Rows rewritten: {report['rows_rewritten']}")
+    if report['rows_rewritten']:
+        ratio = report['data_bytes_before'] / max(report['data_bytes_after'], 1)
+        print(f"📦 Snapshot data: {format_bytes(report['data_bytes_before'])} -> "
+              f"{format_bytes(report['data_bytes_after'])} ({ratio:.1f}x smaller)")
+    print(f"💾 Database file: {format_bytes(report['file_bytes_before'])} -> "
+          f"{format_bytes(report['file_bytes_after'])}")
+
+def normalize_history(db: HistoryDatabase, args):
+    """Move legacy player_history rows into the normalized player_points table"""
+    print("🔁 Migrating player_history to player_points...")
+    size_before = os.path.getsize(db.db_path)
+    result = db.migrate_player_history(drop_legacy=args.drop_legacy)
+
+    print(f"📄 Legacy rows: {result['legacy_rows']:,}")
+    print(f"➕ Newly migrated rows: {result['migrated_rows']:,}")
+    print(f"📈 player_points rows: {result['player_points_rows']:,}")
+    if result['legacy_dropped']:
+        db.vacuum()
+        print(f"🗑️  Legacy rows dropped; database file: {format_bytes(size_before)} -> "
+              f"{format_bytes(os.path.getsize(db.db_path))}")
+
+def rebuild_rollups(db: HistoryDatabase, args):
+    """Recompute the hourly and daily history rollups from the raw rows"""
+    print("📊 Rebuilding history rollups...")
+    for table, rows in db.rebuild_rollups().items():
+        print(f"📈 {table}: {rows:,} rows")
+
+def verify_stats(db: HistoryDatabase, args):
+    """Recount the tables and compare with the maintained statistics"""
+    print("🔍 Verifying database statistics...")
+    drift = db.verify_stats()
+    if not drift:
+        print("✅ Statistics match the tables")
+        return 0
+    for name, (stored, actual) in drift.items():
+        print(f"⚠️  {name}: stored {stored}, actual {actual}")
+    print("Run 'python migrate_database.py rebuild-stats' to correct them")
+    return 1
+
+def rebuild_stats(db: HistoryDatabase, args):
+    """Recount the maintained statistics from the tables"""
+    print("🔢 Rebuilding database statistics...")
+    for name, value in db.rebuild_stats().items():
+        print(f"📈 {name}: {value:,}" if isinstance(value, int) else f"📅 {name}: {value}")
+
+COMMANDS = {
+    'compress-snapshots': (compress_snapshots, 'Compress stored snapshots and reclaim disk space'),
+    'normalize-history': (normalize_history, 'Move legacy player_history rows into player_points'),
+    'rebuild-rollups': (rebuild_rollups, 'Recompute the hourly and daily history rollup tables'),
+    'verify-stats': (verify_stats, 'Check the maintained statistics against a full recount (exit 1 on drift)'),
+    'rebuild-stats': (rebuild_stats, 'Recount the maintained statistics from the tables'),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--db', help='Path to the database (defaults to the environment-specific location)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    subparsers.choices['normalize-history'].add_argument(
+        '--drop-legacy', action='store_true', help='Delete the legacy rows after migrating them'
+    )
+
+    args = parser.parse_args()
+    db = HistoryDatabase(args.db)
+    try:
+        return COMMANDS[args.command][0](db, args)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+from database import HistoryDatabase
+from metrics import PIPELINE_CYCLES, PIPELINE_LAST_SUCCESS, PIPELINE_PHASE_SECONDS
+from profiling import SamplingProfiler
+from config import Config
+
+if TYPE_CHECKING:
+    # Only for annotations: web processes import this module without scraping
+    from scraper import DeadmanScraper
+    from data_processor import DataProcessor
+
+def load_latest_snapshot(db: HistoryDatabase) -> Optional[Tuple[Dict, datetime]]:
+    """Return (data, local update time) of the newest stored snapshot, if any"""
+    entry = db.get_latest_snapshot_entry()
+    if not entry or not entry[1]:
+        return None
+    timestamp, data = entry
+    # Snapshot timestamps are UTC; the rest of the app works in naive local time
+    updated_at = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return data, updated_at.astimezone().replace(tzinfo=None)
+
+def notify_path_for(db: HistoryDatabase) -> str:
+    """File the worker touches after each saved cycle, next to the database by default"""
+    return Config.UPDATE_NOTIFY_FILE or f'{db.db_path}.updated'
+
+def shared_payloads_path_for(db: HistoryDatabase) -> str:
+    """File the worker publishes pre-serialized payloads to, next to the database by default"""
+    return Config.SHARED_PAYLOADS_FILE or f'{db.db_path}.payloads'
+
+def write_notification(path: str, token: str):
+    """Atomically replace the notify file with the token of the newest saved version"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+
+def metrics_path_for(db: HistoryDatabase) -> str:
+    """File the worker publishes its metrics to, for the web processes' /metrics"""
+    return Config.WORKER_METRICS_FILE or f'{db.db_path}.metrics'
+
+def read_notification(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+class UpdatePipeline:
+    """Scrape, process and persist one hiscores update cycle.
+
+    Owned by whichever process does the scraping: the worker (worker.py), or
+    the web app itself when it runs in combined mode.
+    """
+
+    def __init__(self, scraper: 'DeadmanScraper', processor: 'DataProcessor', db: HistoryDatabase,
+                 on_update: Callable[[Dict, datetime], Optional[str]] = None, notify_path: str = None,
+                 profiler: Optional[SamplingProfiler] = None, profile_every: int = 0):
+        self.scraper = scraper
+        self.processor = processor
+        self.db = db
+        self.on_update = on_update  # Called with each new processed version before it is saved; may return its version
+        self.notify_path = notify_path  # Rewritten after each cycle with a new version so web processes reload
+        self.latest_data = {}
+        self.cycle_lock = threading.Lock()  # One cycle at a time (scheduler and startup run may overlap)
+        self.profiler = profiler  # Samples every profile_every-th cycle when set
+        self.profile_every = profile_every
+        self.cycles = 0
+
+    def load_latest(self) -> Optional[Tuple[Dict, datetime]]:
+        """Seed incremental processing from the newest stored snapshot"""
+        entry = load_latest_snapshot(self.db)
+        if entry:
+            self.latest_data = entry[0]
+        return entry
+
+    def run_once(self) -> Optional[Dict]:
+        """Run one update cycle, returning the new processed data or None if nothing changed"""
+        if not self.cycle_lock.acquire(blocking=False):
+            print("Previous update cycle still running, skipping this one")
+            PIPELINE_CYCLES.inc(outcome='overlapped')
+            return None
+        try:
+            self.cycles += 1
+            if self.profiler and self.profile_every and self.cycles % self.profile_every == 0:
+                # The scrape fans out to the scraper's pool threads, so sample those too
+                with self.profiler.profile('cycle', f'cycle{self.cycles}', thread_prefixes=('scrape',)):
+                    return self._run_cycle()
+            return self._run_cycle()
+        finally:
+            self.cycle_lock.release()
+
+    def _run_cycle(self) -> Optional[Dict]:
+        try:
+            print(f"Starting data update at {datetime.now()}")
+            with PIPELINE_PHASE_SECONDS.time(phase='scrape'):
+                raw_data = self.scraper.scrape_all_data()
+            changed_skills = self.scraper.changed_skills
+
+            # Nothing moved on the hiscores since the last cycle: keep the current data
+            if self.latest_data and not changed_skills:
+                print("Hiscores unchanged, skipping processing and database writes")
+                PIPELINE_CYCLES.inc(outcome='unchanged')
+                return None
+
+            # Process the data, recomputing only the skills that changed when possible
+            with PIPELINE_PHASE_SECONDS.time(phase='process'):
+                if self.latest_data:
+                    processed_data = self.processor.process_data_incremental(self.latest_data, raw_data, changed_skills)
+                else:
+                    processed_data = self.processor.process_data(raw_data)
+
+            # Only publish if processing was successful and we have valid data
+            if not processed_data or not processed_data.get('teams'):
+                print("Processed data was empty or invalid, keeping existing data")
+                PIPELINE_CYCLES.inc(outcome='empty')
+                return None
+
+            self.latest_data = processed_data
+            published_version = None
+            if self.on_update:
+                with PIPELINE_PHASE_SECONDS.time(phase='publish'):
+                    published_version = self.on_update(processed_data, datetime.now())
+            if self.notify_path:
+                # Right after publishing, so web processes pick up the new payloads even if the
+                # save below fails; not the snapshot id, which a deduplicated or skipped save
+                # leaves unchanged
+                write_notification(self.notify_path, published_version or str(time.time_ns()))
+
+            # Save to database for historical tracking
+            outcome = 'updated'
+            try:
+                with PIPELINE_PHASE_SECONDS.time(phase='save'):
+                    self.db.save_cycle(raw_data, processed_data)
+            except Exception as db_error:
+                print(f"Error saving to database: {db_error}")
+                outcome = 'save_failed'
+
+            print(f"Data updated successfully. Teams: {len(processed_data.get('teams', {}))}")
+            PIPELINE_CYCLES.inc(outcome=outcome)
+            PIPELINE_LAST_SUCCESS.set(time.time())
+            return processed_data
+
+        except Exception as e:
+            print(f"Error updating data: {e}")
+            print("Keeping existing data until next update cycle")
+            # The scraper already cached this scrape's pages; forget the changed ones so
+            # the next cycle does not find them unchanged and skip them
+            self.scraper.forget_pages(self.scraper.changed_skills)
+            PIPELINE_CYCLES.inc(outcome='failed')
+            return None
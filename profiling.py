@@ -0,0 +1,142 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+class Profile:
+    """Stack samples collected for the threads one profile is watching"""
+
+    def __init__(self, kind: str, label: str, match: Callable[[int, str], bool], label_threads: bool):
+        self.kind = kind
+        self.label = label
+        self.match = match
+        self.label_threads = label_threads
+        self.stacks = Counter()
+
+class SamplingProfiler:
+    """Low-overhead sampling profiler writing folded stacks for flamegraphs.
+
+    While at least one profile is active, a background thread reads every
+    watched thread's current stack (sys._current_frames) at a fixed interval.
+    Nothing runs between profiles. Each finished profile is written to
+    output_dir as '<time>_<kind>_<label>.folded', one 'frame;frame;frame count'
+    line per distinct stack, ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, output_dir: str, interval: float = 0.005, keep: int = 50):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.keep = keep
+        self.active = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.sampler = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self, kind: str, label: str, thread_id: Optional[int] = None,
+              thread_prefixes: tuple = ()) -> Profile:
+        """Start sampling the given thread (the caller's by default) and any
+        threads whose names start with thread_prefixes"""
+        thread_id = thread_id if thread_id is not None else threading.get_ident()
+        match = lambda ident, name: ident == thread_id or (thread_prefixes and name.startswith(thread_prefixes))
+        profile = Profile(kind, label, match, label_threads=bool(thread_prefixes))
+        with self.lock:
+            self.active.append(profile)
+            if self.sampler is None:
+                self.sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+                self.sampler.start()
+            self.wakeup.notify()
+        return profile
+
+    def stop(self, profile: Profile) -> Optional[str]:
+        """Stop a profile and write it out, returning the file path (None if it caught no samples)"""
+        with self.lock:
+            self.active.remove(profile)
+        if not profile.stacks:
+            return None
+        return self._write(profile)
+
+    @contextmanager
+    def profile(self, kind: str, label: str, thread_prefixes: tuple = ()):
+        profile = self.start(kind, label, thread_prefixes=thread_prefixes)
+        try:
+            yield profile
+        finally:
+            self.stop(profile)
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        while True:
+            with self.lock:
+                while not self.active:
+                    self.wakeup.wait()
+                profiles = list(self.active)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, '')
+                stack = None
+                for profile in profiles:
+                    if profile.match(ident, name):
+                        stack = stack or _collapse(frame)
+                        root = f'{_thread_role(name)};' if profile.label_threads else ''
+                        profile.stacks[root + stack] += 1
+            time.sleep(self.interval)
+
+    def _write(self, profile: Profile) -> str:
+        label = re.sub(r'[^A-Za-z0-9.]+', '-', profile.label).strip('-') or 'unnamed'
+        filename = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{profile.kind}_{label}.folded"
+        path = os.path.join(self.output_dir, filename)
+        with open(path, 'w') as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Keep only the newest profiles"""
+        for filename in list_profiles(self.output_dir)[self.keep:]:
+            try:
+                os.remove(os.path.join(self.output_dir, filename))
+            except OSError:
+                pass
+
+def _collapse(frame) -> str:
+    """Semicolon-joined stack from the outermost frame to the innermost"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(frames))
+
+def _thread_role(name: str) -> str:
+    # Pool threads are numbered ('scrape_3'); merge them into one root frame
+    return re.sub(r'[_-]\d+$', '', name) or 'thread'
+
+def list_profiles(output_dir: str) -> List[str]:
+    """Profile file names, newest first"""
+    try:
+        names = [name for name in os.listdir(output_dir) if name.endswith('.folded')]
+    except OSError:
+        return []
+    return sorted(names, reverse=True)
+
+def describe_profile(output_dir: str, filename: str) -> Dict:
+    """Summary of one profile file for the admin listing"""
+    stamp, kind, label = filename[:-len('.folded')].split('_', 2)
+    with open(os.path.join(output_dir, filename)) as f:
+        samples = sum(int(line.rsplit(' ', 1)[1]) for line in f if line.strip())
+    return {
+        'file': filename,
+        'kind': kind,
+        'label': label,
+        'created': datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f').isoformat(),
+        'samples': samples
+    }
@@ -0,0 +1,301 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from flask import Response, request
+from json_patch import PatchLog, make_patch
+from event_stream import version_event
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+JSON_MIMETYPE = 'application/json'
+JSON_PATCH_MIMETYPE = 'application/json-patch+json'
+
+# Bodies this small are cheaper to send as is than to compress
+MIN_COMPRESS_SIZE = 1024
+
+# Every variant is recompressed on each refresh, so brotli runs at a dynamic-content
+# quality instead of its default 11; a 1 MB window covers the largest payloads
+BROTLI_QUALITY = 5
+BROTLI_LGWIN = 20
+
+# The /api/data fields each page renders; their projections are pre-serialized
+PAGE_FIELDS = {
+    'dashboard': 'overall_stats,leaderboards,teams.name,teams.averages',
+    'teams': 'leaderboards,teams.name,teams.averages,teams.totals,teams.best_players,teams.rankings',
+    'compare': 'teams.name,teams.averages',
+    'players': 'last_updated',
+}
+
+def compact_dumps(obj) -> str:
+    """Serialize like Flask's jsonify (sorted keys, ASCII) with compact separators"""
+    return json.dumps(obj, separators=(',', ':'), sort_keys=True)
+
+class Payload:
+    """One endpoint's serialized JSON body plus its pre-compressed variants"""
+    __slots__ = ('body', 'gzip_body', 'brotli_body', 'etag', 'mimetype')
+
+    def __init__(self, body: bytes, mimetype: str = JSON_MIMETYPE, compress: bool = True):
+        self.body = body
+        self.mimetype = mimetype
+        # Strong validator derived from the exact body bytes
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        compress = compress and len(body) >= MIN_COMPRESS_SIZE
+        self.gzip_body = gzip.compress(body, compresslevel=6) if compress else None
+        self.brotli_body = (
+            brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY, lgwin=BROTLI_LGWIN)
+            if compress and BROTLI_AVAILABLE else None
+        )
+
+    def encoded(self, accept_encodings):
+        """Pick the smallest body the client accepts, returning (body, content encoding)"""
+        if self.brotli_body is not None and accept_encodings['br']:
+            return self.brotli_body, 'br'
+        if self.gzip_body is not None and accept_encodings['gzip']:
+            return self.gzip_body, 'gzip'
+        return self.body, None
+
+class PayloadSet:
+    """Immutable collection of the API payloads for one data version.
+
+    Built once per data refresh and replaced as a whole, so request handlers
+    can read it without taking any lock.
+    """
+
+    # Field projections built on demand per version; bounded since clients pick the fields
+    PROJECTION_CACHE_SIZE = 64
+
+    def __init__(self, payloads: Dict[str, Payload], document: Dict, last_modified: Optional[datetime] = None,
+                 event: Optional[Dict] = None):
+        self._payloads = payloads
+        self._document = document  # The /api/data document the payloads were built from
+        self.last_modified = last_modified
+        self.event = event  # Compact 'version changed' event for /api/stream
+        # The full /api/data body identifies the data version
+        self.version = payloads['data'].etag
+        self._projections = OrderedDict()
+        self._projections_lock = threading.Lock()
+
+    @property
+    def document(self) -> Dict:
+        return self._document
+
+    def get(self, key: str) -> Optional[Payload]:
+        return self._payloads.get(key)
+
+    def keys(self):
+        return self._payloads.keys()
+
+    def projection(self, key, build: Callable[[], Payload]) -> Payload:
+        """Return a memoized on-demand payload, building it on first use"""
+        with self._projections_lock:
+            payload = self._projections.get(key)
+            if payload is not None:
+                self._projections.move_to_end(key)
+                return payload
+        payload = build()
+        with self._projections_lock:
+            self._projections[key] = payload
+            if len(self._projections) > self.PROJECTION_CACHE_SIZE:
+                self._projections.popitem(last=False)
+        return payload
+
+def parse_fields(value: str) -> Tuple[Tuple[str, ...], ...]:
+    """Parse a ?fields= list like 'overall_stats,teams.averages' into sorted dotted paths"""
+    paths = {tuple(part for part in field.strip().split('.') if part) for field in value.split(',')}
+    return tuple(sorted(path for path in paths if path))
+
+def fields_key(fields: Tuple[Tuple[str, ...], ...]) -> str:
+    """Canonical spelling of parsed fields, used in payload keys"""
+    return ','.join('.'.join(path) for path in fields)
+
+def select_fields(document: Dict, fields: Tuple[Tuple[str, ...], ...]) -> Dict:
+    """Project the data of an /api/data document"""
+    return {'data': project(document['data'], fields), 'last_update': document['last_update']}
+
+def project(obj: Any, paths: Tuple[Tuple[str, ...], ...]) -> Any:
+    """Keep only the selected dotted paths of a nested dict, preserving its structure.
+
+    A path segment that is not a key of the current dict is looked up in each
+    of its values instead, so 'teams.averages' selects every team's averages
+    ('teams.*.averages' spells the same thing out).
+    """
+    if not paths or any(not path for path in paths):
+        return obj
+    if not isinstance(obj, dict):
+        return None
+    
+    result = {}
+    for path in paths:
+        head, rest = path[0], path[1:]
+        if head in obj:
+            _merge(result, head, project(obj[head], (rest,)))
+        elif head == '*':
+            for key, value in obj.items():
+                _merge(result, key, project(value, (rest,)))
+        else:
+            # Implicit '*': look the segment up one level down
+            for key, value in obj.items():
+                if isinstance(value, dict) and head in value:
+                    selected = project(value[head], (rest,))
+                    if selected is not None:
+                        _merge(result, key, {head: selected})
+    return result
+
+def _merge(result: Dict, key, value):
+    """Combine selections from several paths landing on the same key"""
+    if isinstance(result.get(key), dict) and isinstance(value, dict):
+        # Copy first: the selected dict may be part of the live data
+        merged = result[key] = dict(result[key])
+        for sub_key, sub_value in value.items():
+            _merge(merged, sub_key, sub_value)
+    elif value is not None:
+        result[key] = value
+
+def page_projections(document: Dict) -> Dict[str, Dict]:
+    """The pre-serialized page projections of an /api/data document, by payload key"""
+    projections = {}
+    for page_fields in PAGE_FIELDS.values():
+        fields = parse_fields(page_fields)
+        projections[f'fields:{fields_key(fields)}'] = select_fields(document, fields)
+    return projections
+
+def patch_payload(ops: List[Dict], full: Payload, dumps: Callable[[object], str]) -> Optional[Payload]:
+    """Patch payload for ops, or None when it would be no smaller than the full
+    payload. Sizes are compared uncompressed, so only kept patches get compressed."""
+    body = (dumps(ops) + '\n').encode('utf-8')
+    if len(body) >= len(full.body):
+        return None
+    return Payload(body, JSON_PATCH_MIMETYPE)
+
+def build_payloads(data: Dict, last_update: Optional[datetime], dumps: Callable[[object], str],
+                   patches: Optional[Dict[str, Dict[str, List[Dict]]]] = None, processor=None,
+                   document: Optional[Dict] = None, projections: Optional[Dict[str, Dict]] = None) -> PayloadSet:
+    """Serialize every cached endpoint for a processed data dict.
+
+    patches maps 'data' and each page projection key to {older version: JSON
+    patch bringing that version up to this one}, newest version first; each is
+    served as '<key>:since:<version>' ('since:<version>' for the full document)
+    unless it would be no smaller than the full payload. document and
+    projections may be passed when the caller already built them. With a
+    processor, per-player stats and team comparisons are included too.
+    """
+    def serialize(obj, mimetype: str = JSON_MIMETYPE) -> Payload:
+        return serialize_payload(obj, dumps, mimetype)
+
+    def add_versioned(key: str, prefix: str, full: Payload, version_patches: Dict[str, List[Dict]]):
+        """Add a full payload plus the patches to it, keyed '<prefix>since:<base version>'"""
+        payloads[key] = full
+        payloads[f'{prefix}since:{version}'] = serialize([], JSON_PATCH_MIMETYPE)
+        # Older versions' patches extend newer ones, so once one is too large all the rest are
+        for base_version, ops in version_patches.items():
+            patch = patch_payload(ops, full, dumps)
+            if patch is None:
+                break
+            payloads[f'{prefix}since:{base_version}'] = patch
+
+    teams = data.get('teams', {})
+    patches = patches or {}
+    if document is None:
+        document = {'data': data, 'last_update': last_update.isoformat() if last_update else None}
+    full = serialize(document)
+    version = full.etag
+    payloads = {
+        'teams': serialize(teams),
+        'leaderboards': serialize(data.get('leaderboards', {})),
+        'team:': serialize({})  # Unknown team
+    }
+    for team_code, team_data in teams.items():
+        payloads[f'team:{team_code}'] = serialize(team_data)
+    add_versioned('data', '', full, patches.get('data', {}))
+
+    for key, projected in (projections or page_projections(document)).items():
+        add_versioned(key, f'{key}:', serialize(projected), patches.get(key, {}))
+
+    if processor is not None:
+        # Only ever served as parts of composed responses, so left uncompressed
+        for name, skills in processor.build_player_index(data).items():
+            payloads[f'skills:{name}'] = serialize_payload(skills, dumps, compress=False)
+        for team1 in teams:
+            for team2 in teams:
+                if team1 != team2:
+                    payloads[f'comparison:{team1}:{team2}'] = serialize(processor.compare_teams(teams, team1, team2))
+
+    event = version_event(version, document['last_update'], data)
+    return PayloadSet(payloads, document, last_update, event)
+
+class PayloadBuilder:
+    """Builds the PayloadSet of each new data version, remembering the recent
+    versions it can serve patches from"""
+
+    def __init__(self, dumps: Callable[[object], str], processor=None, history: int = 8):
+        self.dumps = dumps
+        self.processor = processor
+        self.patch_log = PatchLog(history)
+        # Page projections get their own rings of step patches, so each refresh diffs
+        # only the previous projection instead of every version in the ring
+        self.projection_logs = {key: PatchLog(history) for key in page_projections({'data': {}, 'last_update': None})}
+        self.projections = {}
+        self.current = build_payloads({}, None, dumps)
+
+    def build(self, data: Dict, updated_at: datetime) -> PayloadSet:
+        previous = self.current
+        document = {'data': data, 'last_update': updated_at.isoformat()}
+        projections = page_projections(document)
+        if previous.document['data']:
+            self.patch_log.record(previous.version, previous.document, make_patch(previous.document, document))
+            for key, projected in projections.items():
+                self.projection_logs[key].record(previous.version, self.projections[key],
+                                                 make_patch(self.projections[key], projected))
+        self.projections = projections
+        
+        patches = {key: log.patches_to_latest() for key, log in self.projection_logs.items()}
+        patches['data'] = self.patch_log.patches_to_latest()
+        self.current = build_payloads(data, updated_at, self.dumps, patches, self.processor, document, projections)
+        return self.current
+
+def serialize_payload(obj, dumps: Callable[[object], str], mimetype: str = JSON_MIMETYPE,
+                      compress: bool = True) -> Payload:
+    return Payload((dumps(obj) + '\n').encode('utf-8'), mimetype, compress)
+
+def compose_object(items: List[Tuple[str, bytes]]) -> bytes:
+    """Join (key, serialized JSON value) pairs into one JSON object body"""
+    parts = [b'{']
+    for index, (key, value) in enumerate(items):
+        parts.extend((b',' if index else b'', compact_dumps(key).encode('utf-8'), b':', value))
+    parts.append(b'}\n')
+    return b''.join(parts)
+
+def payload_response(payload: Payload, last_modified: Optional[datetime] = None, version: str = None) -> Response:
+    """Build a response from a cached payload, compressed if the client allows it.
+
+    Carries a strong ETag and Last-Modified, and answers matching conditional
+    requests with 304 Not Modified.
+    """
+    body, encoding = payload.encoded(request.accept_encodings)
+    if isinstance(body, memoryview):
+        # WSGI servers only accept bytes: copy the mapped body just for this response
+        body = body.tobytes()
+    response = Response(body, mimetype=payload.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        # Each representation needs its own strong validator
+        response.set_etag(f'{payload.etag}-{encoding}')
+    else:
+        response.set_etag(payload.etag)
+    if last_modified:
+        # Naive datetimes are local time; HTTP dates are UTC
+        response.last_modified = last_modified.astimezone(timezone.utc)
+    if version:
+        response.headers['X-Data-Version'] = version
+    response.vary.add('Accept-Encoding')
+    # Let browsers keep the body but always revalidate (cheap 304s between refreshes)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
@@ -5,21 +5,35 @@ Simple script to run the Deadman All Stars Hiscores application
 
 import sys
 import os
-from app import app
 from config import Config
 
 def main():
     """Main function to run the Flask application"""
     try:
         print("🏆 Starting Deadman All Stars Hiscores Tracker...")
-        print(f"📊 Data will be scraped and updated every {Config.SCRAPE_INTERVAL // 60} minutes")
+        if Config.RUN_MODE == 'web':
+            print("📊 Serving data saved by the scraper worker (run worker.py separately)")
+        else:
+            print(f"📊 Data will be scraped and updated every {Config.SCRAPE_INTERVAL // 60} minutes")
         
         if not Config.IS_RENDER:
             print(f"🌐 Access the application at: http://localhost:{Config.PORT}")
             print("⚠️  Press Ctrl+C to stop the application")
             print("-" * 50)
         
+        if Config.SERVER_MODE == 'asgi':
+            # Event loop server; each worker process imports the app itself
+            import uvicorn
+            uvicorn.run(
+                'asgi:application',
+                host=Config.HOST,
+                port=Config.PORT,
+                workers=Config.ASGI_WORKERS
+            )
+            return
+        
         # Run the Flask application
+        from app import app
         app.run(
             debug=Config.DEBUG,
             host=Config.HOST,
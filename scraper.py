@@ -1,13 +1,59 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 import urllib.parse
+from config import Config
+from html_parsers import get_parser
+from metrics import (SCRAPE_BYTES, SCRAPE_FETCH_SECONDS, SCRAPE_PAGES, SCRAPE_PARSE_SECONDS, SCRAPE_RETRIES,
+                     SCRAPE_ROWS)
+
+# Precompiled patterns shared by all parser backends
+RANK_RE = re.compile(r'\d+')
+NON_DIGIT_RE = re.compile(r'[^\d]')
+NON_ASCII_RE = re.compile(r'[^\x00-\x7f]')
+
+def normalize_name(name: str) -> str:
+    """Normalize a hiscore name in one pass: non-ASCII characters (the site's
+    non-breaking spaces and their mis-decoded forms) become spaces, whitespace collapses"""
+    return ' '.join(NON_ASCII_RE.sub(' ', name).split())
+
+def parse_int(text: str, default: int) -> int:
+    """Parse a formatted number such as '1,234,567', returning default for empty cells"""
+    return int(NON_DIGIT_RE.sub('', text)) if text else default
+
+class TokenBucket:
+    """Thread-safe token bucket used to cap the request rate to the hiscores host"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
 class DeadmanScraper:
-    def __init__(self):
-        self.base_url = "https://secure.runescape.com/m=hiscore_oldschool_tournament"
+    def __init__(self, max_workers: int = None, rate_limit: float = None, burst: int = None, parser: str = None,
+                 base_url: str = None):
+        self.base_url = (base_url or Config.HISCORES_BASE_URL).rstrip('/')
         self.skills = [
             'overall', 'attack', 'defence', 'strength', 'hitpoints', 'ranged', 
             'prayer', 'magic', 'cooking', 'woodcutting', 'fletching', 'fishing',
@@ -25,10 +71,33 @@ class DeadmanScraper:
             'SNA': 'Solomission Snakes'
         }
         
+        self.skill_set = set(self.skills)
+        self.team_prefix_tuple = tuple(self.team_prefixes.keys())
+        
+        # HTML parser backend used for all hiscore pages
+        self.parser = get_parser(parser or Config.HTML_PARSER)
+        
+        # Concurrency and politeness settings (one bucket shared by all worker threads)
+        self.max_workers = max(1, max_workers if max_workers is not None else Config.SCRAPE_MAX_WORKERS)
+        self.rate_limiter = TokenBucket(
+            rate_limit if rate_limit is not None else Config.SCRAPE_RATE_LIMIT,
+            burst if burst is not None else Config.SCRAPE_BURST
+        )
+        
+        # Per-URL validators (ETag, Last-Modified), body hash and parsed rows from
+        # the previous fetch, used to skip re-downloading and re-parsing unchanged pages
+        self.page_cache = {}
+        self.changed_skills = set()
+        self.cache_lock = threading.Lock()
+        
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Size the connection pool so concurrent workers reuse keep-alive connections
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def get_skill_table_id(self, skill: str) -> int:
         """Get the table ID for a specific skill"""
@@ -52,48 +121,27 @@ class DeadmanScraper:
             url = f"{self.base_url}/overall?table={table_id}&page={page}"
             
             try:
-                response = self.session.get(url, timeout=10)
+                self.rate_limiter.acquire()
+                response = self._fetch(url, 'names', timeout=10)
                 response.raise_for_status()
+                SCRAPE_PAGES.inc(kind='names', outcome='ok')
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
-                rows = soup.find_all('tr')
-                
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 2:
-                        try:
-                            name_cell = cells[1]
-                            
-                            # Extract player name
-                            name_link = name_cell.find('a')
-                            if name_link:
-                                name = name_link.get_text(strip=True)
-                            else:
-                                name = name_cell.get_text(strip=True)
-                            
-                            # Fix character encoding issues
-                            name = name.replace('Ā', ' ').replace('ā', ' ').replace('\u0100', ' ').replace('\u0101', ' ').strip()
-                            name = ''.join(c if ord(c) < 128 else ' ' for c in name)
-                            name = ' '.join(name.split())
-                            
-                            # Skip if name is empty or contains headers
-                            if not name or 'Rank' in name or 'Name' in name:
-                                continue
-                                
-                            # Skip referees
-                            if name.startswith('Ref'):
-                                continue
-                            
-                            # Only include team players
-                            if any(name.startswith(prefix) for prefix in self.team_prefixes.keys()):
-                                all_players.append(name)
-                                
-                        except (ValueError, AttributeError):
-                            continue
-                            
-                time.sleep(0.5)  # Be respectful
+                for cells in self.parser.iter_rows(response.content):
+                    if len(cells) < 2:
+                        continue
+                    
+                    name = normalize_name(cells[1])
+                    
+                    # Skip empty names, headers and referees
+                    if not name or 'Rank' in name or 'Name' in name or name.startswith('Ref'):
+                        continue
+                    
+                    # Only include team players
+                    if name.startswith(self.team_prefix_tuple):
+                        all_players.append(name)
                 
             except requests.RequestException as e:
+                SCRAPE_PAGES.inc(kind='names', outcome='error')
                 print(f"Error getting player names from page {page}: {e}")
         
         return list(set(all_players))  # Remove duplicates
@@ -107,52 +155,35 @@ class DeadmanScraper:
         player_stats = {}
         
         try:
-            response = self.session.get(url, timeout=10)
+            self.rate_limiter.acquire()
+            response = self._fetch(url, 'personal', timeout=10)
             response.raise_for_status()
+            SCRAPE_PAGES.inc(kind='personal', outcome='ok')
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find the table with player stats
-            rows = soup.find_all('tr')
-            
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 4:
-                    try:
-                        skill_cell = cells[0]
-                        rank_cell = cells[1]
-                        level_cell = cells[2]
-                        xp_cell = cells[3]
-                        
-                        # Extract skill name
-                        skill_text = skill_cell.get_text(strip=True).lower()
-                        
-                        # Skip if not a valid skill
-                        if skill_text not in self.skills:
-                            continue
-                        
-                        # Extract rank, level, and XP
-                        rank_text = rank_cell.get_text(strip=True)
-                        level_text = level_cell.get_text(strip=True)
-                        xp_text = xp_cell.get_text(strip=True)
-                        
-                        # Clean and convert values
-                        rank = int(re.sub(r'[^\d]', '', rank_text)) if rank_text and rank_text != '-' else 0
-                        level = int(re.sub(r'[^\d]', '', level_text)) if level_text else 1
-                        xp = int(re.sub(r'[^\d]', '', xp_text)) if xp_text else 0
-                        
-                        player_stats[skill_text] = {
-                            'rank': rank,
-                            'name': player_name,
-                            'level': level,
-                            'xp': xp,
-                            'skill': skill_text
-                        }
-                        
-                    except (ValueError, AttributeError):
-                        continue
+            for cells in self.parser.iter_rows(response.content):
+                if len(cells) < 4:
+                    continue
+                
+                # Skip if not a valid skill
+                skill_text = cells[0].lower()
+                if skill_text not in self.skill_set:
+                    continue
+                
+                rank_text, level_text, xp_text = cells[1], cells[2], cells[3]
+                
+                try:
+                    player_stats[skill_text] = {
+                        'rank': parse_int(rank_text, 0) if rank_text != '-' else 0,
+                        'name': player_name,
+                        'level': parse_int(level_text, 1),
+                        'xp': parse_int(xp_text, 0),
+                        'skill': skill_text
+                    }
+                except ValueError:
+                    continue
             
         except requests.RequestException as e:
+            SCRAPE_PAGES.inc(kind='personal', outcome='error')
             print(f"Error scraping stats for {player_name}: {e}")
         
         return player_stats
@@ -163,17 +194,22 @@ class DeadmanScraper:
         successful_skills = 0
         failed_skills = []
         
-        print("Starting to scrape all skills data using corrected skill table URLs...")
+        print(f"Starting to scrape all skills data using corrected skill table URLs "
+              f"({self.max_workers} workers, {self.rate_limiter.rate:g} req/s)...")
+        start_time = time.monotonic()
+        
+        # Fetch pages 1 and 2 of every skill concurrently; the token bucket keeps
+        # the request rate to the host bounded regardless of the worker count
+        pages = [(skill, page) for skill in self.skills for page in [1, 2]]
+        self.changed_skills = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scrape') as executor:
+            results = executor.map(lambda job: self.scrape_skill_page_alternative(*job), pages)
+            page_results = dict(zip(pages, results))
         
         for skill in self.skills:
-            print(f"Scraping {skill}...")
             skill_data = []
-            
-            # Scrape pages 1 and 2 for each skill
             for page in [1, 2]:
-                players = self.scrape_skill_page_alternative(skill, page)
-                skill_data.extend(players)
-                time.sleep(0.5)
+                skill_data.extend(page_results[(skill, page)])
             
             all_data[skill] = skill_data
             
@@ -183,96 +219,137 @@ class DeadmanScraper:
             else:
                 failed_skills.append(skill)
                 print(f"  {skill}: 0 players (FAILED)")
-            
-            time.sleep(1)  # Be respectful to the server
         
-        print(f"Scraping completed. Successful skills: {successful_skills}/{len(self.skills)}")
+        print(f"Scraping completed in {time.monotonic() - start_time:.1f}s. "
+              f"Successful skills: {successful_skills}/{len(self.skills)}")
         if failed_skills:
             print(f"Failed skills: {', '.join(failed_skills)}")
+        if self.changed_skills:
+            print(f"Changed skills since last scrape: {len(self.changed_skills)}/{len(self.skills)}")
+        else:
+            print("No hiscore pages changed since last scrape")
         
         # Return data even if some skills failed, as long as we have some data
         return all_data
 
+    def skill_page_url(self, skill: str, page: int) -> str:
+        """URL of one page of a skill's hiscore table"""
+        return f"{self.base_url}/overall?table={self.get_skill_table_id(skill)}&page={page}"
+
+    def forget_pages(self, skills):
+        """Drop the cached pages of these skills, so the next scrape parses them again and
+        reports them as changed (used when a scrape's changes could not be processed)"""
+        with self.cache_lock:
+            for skill in skills:
+                for page in [1, 2]:
+                    self.page_cache.pop(self.skill_page_url(skill, page), None)
+
     def scrape_skill_page_alternative(self, skill: str, page: int = 1) -> List[Dict]:
         """Alternative method: Scrape using the correct skill table URLs with retry logic"""
-        table_id = self.get_skill_table_id(skill)
-        url = f"{self.base_url}/overall?table={table_id}&page={page}"
+        url = self.skill_page_url(skill, page)
+        
+        cached = self.page_cache.get(url)
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
         
         # Retry logic for connection issues
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = self.session.get(url, timeout=15)
-                response.raise_for_status()
+                if attempt:
+                    SCRAPE_RETRIES.inc(kind='table')
+                self.rate_limiter.acquire()
+                response = self._fetch(url, 'table', timeout=15, headers=headers)
                 
-                soup = BeautifulSoup(response.content, 'html.parser')
+                # Not modified: reuse the rows parsed last time
+                if response.status_code == 304 and cached:
+                    SCRAPE_PAGES.inc(kind='table', outcome='not_modified')
+                    return cached['players']
                 
-                players = []
-                rows = soup.find_all('tr')
+                response.raise_for_status()
                 
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 3:
-                        try:
-                            rank_text = cells[0].get_text(strip=True)
-                            name_cell = cells[1]
-                            level_text = cells[2].get_text(strip=True) if len(cells) > 2 else "1"
-                            xp_text = cells[3].get_text(strip=True) if len(cells) > 3 else "0"
-                            
-                            # Extract rank
-                            rank_match = re.search(r'\d+', rank_text)
-                            if not rank_match:
-                                continue
-                            rank = int(rank_match.group())
-                            
-                            # Extract player name
-                            name_link = name_cell.find('a')
-                            if name_link:
-                                name = name_link.get_text(strip=True)
-                            else:
-                                name = name_cell.get_text(strip=True)
-                            
-                            # Fix character encoding issues
-                            name = name.replace('Ā', ' ').replace('ā', ' ').replace('\u0100', ' ').replace('\u0101', ' ').strip()
-                            name = ''.join(c if ord(c) < 128 else ' ' for c in name)
-                            name = ' '.join(name.split())
-                            
-                            # Skip if name is empty or contains headers
-                            if not name or 'Rank' in name or 'Name' in name:
-                                continue
-                                
-                            # Skip referees
-                            if name.startswith('Ref'):
-                                continue
-                            
-                            # Clean and convert level and XP
-                            level = int(re.sub(r'[^\d]', '', level_text)) if level_text else 1
-                            xp = int(re.sub(r'[^\d]', '', xp_text)) if xp_text else 0
-                            
-                            players.append({
-                                'rank': rank,
-                                'name': name,
-                                'level': level,
-                                'xp': xp,
-                                'skill': skill
-                            })
-                            
-                        except (ValueError, AttributeError):
-                            continue
+                # Same body as last time (server without validators): skip parsing
+                body_hash = hashlib.sha1(response.content).hexdigest()
+                if cached and cached['hash'] == body_hash:
+                    SCRAPE_PAGES.inc(kind='table', outcome='unchanged')
+                    players = cached['players']
+                else:
+                    SCRAPE_PAGES.inc(kind='table', outcome='changed')
+                    with SCRAPE_PARSE_SECONDS.time(kind='table'):
+                        players = self.parse_skill_page(response.content, skill)
+                    SCRAPE_ROWS.inc(len(players), kind='table')
+                    self._mark_changed(skill)
                 
-                # If we got here successfully, return the players
+                self.page_cache[url] = {
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'hash': body_hash,
+                    'players': players
+                }
                 return players
                 
             except requests.RequestException as e:
+                SCRAPE_PAGES.inc(kind='table', outcome='error')
                 print(f"Error scraping {skill} page {page} (attempt {attempt + 1}/{max_retries}): {e}")
                 if attempt < max_retries - 1:
                     time.sleep(2 ** attempt)  # Exponential backoff
                 else:
                     print(f"Failed to scrape {skill} page {page} after {max_retries} attempts")
+                    # The returned data differs from the cached page, so force a re-parse next time
+                    self.page_cache.pop(url, None)
+                    self._mark_changed(skill)
                     return []
         
         return []
 
+    def _fetch(self, url: str, kind: str, **kwargs) -> requests.Response:
+        """GET a hiscore page, recording the download time and size"""
+        with SCRAPE_FETCH_SECONDS.time(kind=kind):
+            response = self.session.get(url, **kwargs)
+        SCRAPE_BYTES.inc(len(response.content), kind=kind)
+        return response
+
+    def _mark_changed(self, skill: str):
+        """Record that a skill's rows differ from the previous scrape"""
+        with self.cache_lock:
+            self.changed_skills.add(skill)
+
+    def parse_skill_page(self, content: bytes, skill: str) -> List[Dict]:
+        """Extract player rows from a skill hiscore table page"""
+        players = []
+        
+        for cells in self.parser.iter_rows(content):
+            if len(cells) < 3:
+                continue
+            
+            # Extract rank
+            rank_match = RANK_RE.search(cells[0])
+            if not rank_match:
+                continue
+            
+            name = normalize_name(cells[1])
+            
+            # Skip empty names, headers and referees
+            if not name or 'Rank' in name or 'Name' in name or name.startswith('Ref'):
+                continue
+            
+            try:
+                players.append({
+                    'rank': int(rank_match.group()),
+                    'name': name,
+                    'level': parse_int(cells[2], 1),
+                    'xp': parse_int(cells[3], 0) if len(cells) > 3 else 0,
+                    'skill': skill
+                })
+            except ValueError:
+                continue
+        
+        return players
+
     def scrape_all_data_alternative(self) -> Dict:
         """Alternative method: Scrape using skill table approach with correct URLs"""
         all_data = {}
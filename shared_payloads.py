@@ -0,0 +1,107 @@
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import Dict, Optional
+from response_cache import Payload, PayloadSet
+
+# File layout: MAGIC, header length (u64), JSON header, then the bodies back to back.
+# The header maps each payload key to its mimetype, etag and the (offset, length)
+# of its plain, gzip and brotli bodies (length -1 when a variant is absent).
+MAGIC = b'DASPAYLOADS1\n'
+HEADER_LENGTH = struct.Struct('<Q')
+
+def write_payload_file(path: str, payloads: PayloadSet):
+    """Publish a payload set for other processes, replacing the previous version atomically.
+
+    Readers that still map the old file keep a valid view of it until they
+    switch, since os.replace only unlinks its name.
+    """
+    entries = {}
+    blobs = []
+    offset = 0
+    for key in payloads.keys():
+        payload = payloads.get(key)
+        spans = []
+        for body in (payload.body, payload.gzip_body, payload.brotli_body):
+            if body is None:
+                spans.append((0, -1))
+            else:
+                spans.append((offset, len(body)))
+                blobs.append(body)
+                offset += len(body)
+        entries[key] = [payload.mimetype, payload.etag, spans]
+
+    header = json.dumps({
+        'version': payloads.version,
+        'last_modified': payloads.last_modified.isoformat() if payloads.last_modified else None,
+        'event': payloads.event,
+        'entries': entries
+    }, separators=(',', ':')).encode('utf-8')
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class MappedPayload(Payload):
+    """A payload whose bodies are memoryviews into a shared mapping"""
+    __slots__ = ()
+
+    def __init__(self, view: memoryview, mimetype: str, etag: str, spans):
+        self.mimetype = mimetype
+        self.etag = etag
+        self.body, self.gzip_body, self.brotli_body = (
+            view[start:start + length] if length >= 0 else None
+            for start, length in spans
+        )
+
+class MappedPayloadSet(PayloadSet):
+    """Payload set served straight from a file published by write_payload_file.
+
+    Every web process maps the same file read-only, so the bodies live once
+    in the shared page cache however many processes serve them. The /api/data
+    document is only decoded if a request needs the data itself.
+    """
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a payload file')
+        start = len(MAGIC) + HEADER_LENGTH.size
+        (header_length,) = HEADER_LENGTH.unpack(view[len(MAGIC):start])
+        header = json.loads(bytes(view[start:start + header_length]))
+        bodies = view[start + header_length:]
+
+        payloads = {
+            key: MappedPayload(bodies, mimetype, etag, spans)
+            for key, (mimetype, etag, spans) in header['entries'].items()
+        }
+        last_modified = header['last_modified']
+        super().__init__(
+            payloads,
+            None,
+            datetime.fromisoformat(last_modified) if last_modified else None,
+            header['event']
+        )
+
+    @property
+    def document(self) -> Dict:
+        if self._document is None:
+            self._document = json.loads(bytes(self.get('data').body))
+        return self._document
+
+def load_payload_file(path: str) -> Optional[MappedPayloadSet]:
+    """Map a published payload file, or return None if there is none yet"""
+    if not os.path.exists(path):
+        return None
+    return MappedPayloadSet(path)
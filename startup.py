@@ -0,0 +1,32 @@
+import time
+from typing import List, Tuple
+from metrics import STARTUP_PHASE_SECONDS
+
+class StartupTimer:
+    """Wall time of each startup phase of this process, printed once it is ready to
+    serve and exported on /metrics, so slow imports or loads show up as regressions"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> float:
+        """End the current phase under the given name, returning its duration"""
+        now = time.perf_counter()
+        seconds = now - self.last
+        self.last = now
+        self.phases.append((phase, seconds))
+        STARTUP_PHASE_SECONDS.set(round(seconds, 6), phase=phase)
+        return seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def report(self) -> str:
+        phases = ', '.join(f'{phase} {seconds * 1000:.0f} ms' for phase, seconds in self.phases)
+        return f"⏱️  Startup: {phases} (ready {self.elapsed() * 1000:.0f} ms after import)"
+
+# Created on first import; app.py imports this module before anything else so the
+# 'imports' phase covers Flask and the app's own modules
+startup_timer = StartupTimer()
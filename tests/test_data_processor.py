@@ -0,0 +1,39 @@
+from data_processor import DataProcessor
+
+def make_raw_data(xp: int):
+    players = [
+        {'name': 'BB Alice', 'level': 50, 'xp': xp, 'rank': 1},
+        {'name': 'DN Bob', 'level': 40, 'xp': xp // 2, 'rank': 2},
+    ]
+    return {'overall': players, 'attack': [dict(player, xp=player['xp'] // 10) for player in players]}
+
+def test_incremental_matches_full_rebuild():
+    processor = DataProcessor(backend='loop')
+    previous = processor.process_data(make_raw_data(1000))
+    raw_data = make_raw_data(2000)
+    raw_data['attack'] = make_raw_data(1000)['attack']
+    
+    incremental = processor.process_data_incremental(previous, raw_data, {'overall'})
+    
+    assert incremental['teams'] == processor.process_data(raw_data)['teams']
+    assert previous['teams']['BB']['totals'] == processor.process_data(make_raw_data(1000))['teams']['BB']['totals']
+
+def test_incremental_rejects_scrape_without_skill_data():
+    processor = DataProcessor(backend='loop')
+    previous = processor.process_data(make_raw_data(1000))
+    empty = {'overall': [], 'attack': []}
+    
+    # Same result as a full rebuild of the empty scrape, so the pipeline keeps its current data
+    assert processor.process_data(empty) == {}
+    assert processor.process_data_incremental(previous, empty, {'overall', 'attack'}) == {}
+
+def test_incremental_drops_players_who_left_the_hiscores():
+    processor = DataProcessor(backend='loop')
+    previous = processor.process_data(make_raw_data(1000))
+    raw_data = {skill: [player for player in players if player['name'] != 'DN Bob']
+                for skill, players in make_raw_data(2000).items()}
+    
+    incremental = processor.process_data_incremental(previous, raw_data, {'overall', 'attack'})
+    
+    assert incremental == processor.process_data(raw_data)
+    assert incremental['teams']['DN']['players'] == []
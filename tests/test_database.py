@@ -0,0 +1,52 @@
+from data_processor import DataProcessor
+from database import HistoryDatabase
+
+DAYS = 86400
+
+def make_raw_data(*players):
+    return {'overall': [{'name': name, 'level': 50, 'xp': xp, 'rank': rank}
+                        for rank, (name, xp) in enumerate(players, 1)]}
+
+def save(db: HistoryDatabase, raw_data):
+    db.save_cycle(raw_data, DataProcessor(backend='loop').process_data(raw_data))
+
+def backdate(db: HistoryDatabase, days: int):
+    """Move every stored row the given number of days into the past"""
+    with db._write_connection() as conn:
+        conn.execute("UPDATE snapshots SET timestamp = datetime(timestamp, ?)", (f'-{days} days',))
+        conn.execute("UPDATE team_history SET timestamp = datetime(timestamp, ?)", (f'-{days} days',))
+        conn.execute("UPDATE player_points SET ts = ts - ?", (days * DAYS,))
+        for suffix in HistoryDatabase.ROLLUP_SECONDS:
+            for table in (f'player_points_{suffix}', f'team_history_{suffix}'):
+                conn.execute(f"UPDATE {table} SET ts = ts - ?, bucket = bucket - ?", (days * DAYS, days * DAYS))
+    db.rebuild_stats()
+
+def test_stats_match_tables_after_cleanup(tmp_path):
+    db = HistoryDatabase(str(tmp_path / 'history.db'))
+    try:
+        save(db, make_raw_data(('BB Alice', 1000), ('DN Bob', 900)))
+        backdate(db, 40)
+        save(db, make_raw_data(('BB Alice', 2000)))
+        
+        db.cleanup_old_data(days_to_keep=30)
+        
+        assert db.verify_stats() == {}
+        stats = db.get_database_stats()
+        assert stats['total_snapshots'] == 1
+        assert stats['unique_players'] == 1
+        assert db.get_all_players() == ['BB Alice']
+    finally:
+        db.close()
+
+def test_pruned_player_is_counted_again_when_scraped(tmp_path):
+    db = HistoryDatabase(str(tmp_path / 'history.db'))
+    try:
+        save(db, make_raw_data(('BB Alice', 1000), ('DN Bob', 900)))
+        backdate(db, 40)
+        db.cleanup_old_data(days_to_keep=30)
+        save(db, make_raw_data(('BB Alice', 2000), ('DN Bob', 1900)))
+        
+        assert db.verify_stats() == {}
+        assert db.get_database_stats()['unique_players'] == 2
+    finally:
+        db.close()
@@ -0,0 +1,53 @@
+from data_processor import DataProcessor
+from fake_hiscores import FakeHiscores
+from pipeline import UpdatePipeline, read_notification
+from scraper import DeadmanScraper
+
+class FakeScraper:
+    def __init__(self):
+        self.changed_skills = set()
+        self.xp = 1000
+    
+    def scrape_all_data(self):
+        self.xp += 100
+        self.changed_skills = {'overall'}
+        return {'overall': [{'name': 'BB Alice', 'level': 50, 'xp': self.xp, 'rank': 1}]}
+
+class FailingDatabase:
+    def save_cycle(self, raw_data, processed_data):
+        raise OSError('disk full')
+
+def test_web_processes_are_notified_when_the_save_fails(tmp_path):
+    notify_path = str(tmp_path / 'history.db.updated')
+    versions = iter(['v1', 'v2'])
+    pipeline = UpdatePipeline(FakeScraper(), DataProcessor(backend='loop'), FailingDatabase(),
+                              on_update=lambda data, updated_at: next(versions), notify_path=notify_path)
+    
+    assert pipeline.run_once() is not None
+    assert read_notification(notify_path) == 'v1'
+    pipeline.run_once()
+    assert read_notification(notify_path) == 'v2'
+
+def test_changes_are_processed_again_after_a_failed_cycle():
+    hiscores = FakeHiscores(players=30, etags=True)
+    server = hiscores.serve()
+    published = []
+    
+    def publish(data, updated_at):
+        published.append(data)
+        if len(published) == 2:
+            raise RuntimeError('publish failed')
+        return f'v{len(published)}'
+    
+    try:
+        scraper = DeadmanScraper(max_workers=4, rate_limit=0, base_url=hiscores.base_url)
+        pipeline = UpdatePipeline(scraper, DataProcessor(backend='loop'), FailingDatabase(), on_update=publish)
+        assert pipeline.run_once() is not None
+        
+        hiscores.advance()
+        assert pipeline.run_once() is None
+        # The hiscores have not moved since, but the failed cycle's changes were never published
+        assert pipeline.run_once() is not None
+        assert len(published) == 3
+    finally:
+        server.shutdown()
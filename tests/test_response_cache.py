@@ -0,0 +1,16 @@
+import gzip
+import brotli
+from response_cache import Payload
+
+ACCEPT_ALL = {'br': 1, 'gzip': 1}
+
+def test_payload_prefers_brotli_and_round_trips():
+    body = b'{"data":' + b'[1,2,3],' * 2000 + b'"end":1}'
+    payload = Payload(body)
+    
+    encoded, encoding = payload.encoded(ACCEPT_ALL)
+    
+    assert encoding == 'br'
+    assert brotli.decompress(encoded) == body
+    assert gzip.decompress(payload.encoded({'br': 0, 'gzip': 1})[0]) == body
+    assert payload.encoded({'br': 0, 'gzip': 0}) == (body, None)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Standalone scraper worker for the Deadman All Stars Hiscores application.
+
+Owns scraping, processing and persistence. Web processes started with
+RUN_MODE=web only read, reloading whenever this worker saves a new cycle.
+"""
+
+import sys
+from datetime import datetime
+from apscheduler.schedulers.blocking import BlockingScheduler
+from scraper import DeadmanScraper
+from data_processor import DataProcessor
+from database import HistoryDatabase
+from pipeline import UpdatePipeline, metrics_path_for, notify_path_for, shared_payloads_path_for, write_notification
+from response_cache import PayloadBuilder, compact_dumps
+from shared_payloads import write_payload_file
+from metrics import write_metrics_file
+from profiling import SamplingProfiler
+from config import Config
+
+def main():
+    """Run an update cycle now and then every SCRAPE_INTERVAL seconds"""
+    db = HistoryDatabase()
+    processor = DataProcessor()
+    
+    # Web processes map the payloads published here instead of each building their own
+    payloads_path = shared_payloads_path_for(db)
+    builder = PayloadBuilder(compact_dumps, processor, Config.PATCH_HISTORY)
+    
+    def publish(data, updated_at):
+        payloads = builder.build(data, updated_at)
+        write_payload_file(payloads_path, payloads)
+        return payloads.version
+    
+    profiler = None
+    if Config.PROFILE_ENABLED:
+        profiler = SamplingProfiler(Config.PROFILE_DIR, Config.PROFILE_INTERVAL, Config.PROFILE_KEEP)
+    pipeline = UpdatePipeline(DeadmanScraper(), processor, db, on_update=publish, notify_path=notify_path_for(db),
+                              profiler=profiler, profile_every=Config.PROFILE_CYCLE_EVERY)
+    entry = pipeline.load_latest()
+    if entry:
+        publish(*entry)
+        write_notification(pipeline.notify_path, builder.current.version)
+        print("Loaded latest snapshot from database")
+    
+    # Web processes serve these on /metrics alongside their own
+    metrics_path = metrics_path_for(db)
+    
+    def run_cycle():
+        pipeline.run_once()
+        write_metrics_file(metrics_path)
+
+    scheduler = BlockingScheduler()
+    scheduler.add_job(
+        func=run_cycle,
+        trigger="interval",
+        seconds=Config.SCRAPE_INTERVAL,
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True
+    )
+
+    print(f"🛠️  Scraper worker started, updating every {Config.SCRAPE_INTERVAL // 60} minutes")
+    print(f"📣 Publishing payloads to {payloads_path}, notifying through {pipeline.notify_path}")
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        print("\n👋 Worker stopped")
+    finally:
+        db.close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()